@@ -1,24 +1,50 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ReturnDocument, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson import Binary
 import os
 import logging
+import asyncio
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Union
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 import secrets
+import base64
+import json
+import hashlib
+import functools
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+try:
+    import orjson
+except ImportError:  # Optional: without it responses go through the standard encoder
+    orjson = None
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError, WatchError
+except ImportError:  # Optional: only needed for a shared response cache
+    aioredis = None
+    RedisError = WatchError = Exception
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, uuidRepresentation="standard")
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -64,6 +90,10 @@ class DispatchStatus(str, Enum):
     UNDER_PROCESS = "under_process"
     RECEIVED = "received"
 
+class DueKind(str, Enum):
+    REFILL = "refill"
+    PRESSURE_TEST = "pressure_test"
+
 class MaintenanceItemStatus(str, Enum):
     PENDING = "pending"
     IN_PROGRESS = "in_progress"
@@ -78,6 +108,8 @@ class SmokeDetector(BaseModel):
     status: DetectorStatus = DetectorStatus.ACTIVE
     last_triggered: Optional[datetime] = None
     battery_level: int = 100
+    # When the gateway took the battery_level reading; older readings arriving late are ignored
+    battery_reported_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -105,6 +137,8 @@ class FireExtinguisher(BaseModel):
     next_pressure_test_due: datetime
     dispatch_date: Optional[datetime] = None
     received_date: Optional[datetime] = None
+    days_until_refill: Optional[int] = None
+    days_until_pressure_test: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -124,11 +158,13 @@ class FireExtinguisherUpdate(BaseModel):
 
 class MaintenanceNote(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    item_id: Optional[str] = None
     note: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     created_by: str = "system"
 
 class MaintenanceItem(BaseModel):
+    # Notes live in maintenance_notes; the item keeps their count and the latest one
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     description: Optional[str] = ""
@@ -136,7 +172,8 @@ class MaintenanceItem(BaseModel):
     priority: str = "medium"  # low, medium, high
     assigned_to: Optional[str] = None
     due_date: Optional[datetime] = None
-    notes: List[MaintenanceNote] = []
+    note_count: int = 0
+    latest_note: Optional[MaintenanceNote] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -169,12 +206,84 @@ class Alert(BaseModel):
     message: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     acknowledged: bool = False
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Repeat triggers folded into this alert (see raise_alert); last_seen is None on older alerts
+    occurrences: int = 1
+    last_seen: Optional[datetime] = None
+    incident_id: Optional[str] = None
+
+class Incident(BaseModel):
+    """Alerts from one zone close together in time (see correlate_incident)."""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    zone: str
+    location: str
+    detector_ids: List[str] = []
+    extinguisher_ids: List[str] = []
+    occurrences: int = 1
+    started_at: datetime
+    last_seen: datetime
+    acknowledged: bool = False
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DetectorEventType(str, Enum):
+    TRIGGER = "trigger"
+    BATTERY = "battery"
+
+class DetectorEvent(BaseModel):
+    detector_id: str
+    type: DetectorEventType
+    battery_level: Optional[int] = Field(None, ge=0, le=100)
+    timestamp: Optional[datetime] = None
+    
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Compared with the stored (naive UTC) times and with each other
+        return naive_utc(value) if value is not None else None
+
+class QueuedDetectorEvent(DetectorEvent):
+    """A write-behind queue entry: the latest event of its detector and type, standing for occurrences events since first_timestamp."""
+    occurrences: int = 1
+    first_timestamp: Optional[datetime] = None
+
+class AlertSelection(BaseModel):
+    """Alerts a bulk action applies to: the given ids and/or everything matching the filters."""
+    ids: Optional[List[str]] = None
+    detector_id: Optional[str] = None
+    extinguisher_id: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
 
 class AlertCreate(BaseModel):
     detector_id: Optional[str] = None
     extinguisher_id: Optional[str] = None
     message: str
 
+# Pages returned by the list endpoints when ?limit= or ?after= is given
+class SmokeDetectorPage(BaseModel):
+    items: List[SmokeDetector]
+    next_cursor: Optional[str] = None
+
+class FireExtinguisherPage(BaseModel):
+    items: List[FireExtinguisher]
+    next_cursor: Optional[str] = None
+
+class MaintenanceItemPage(BaseModel):
+    items: List[MaintenanceItem]
+    next_cursor: Optional[str] = None
+
+class MaintenanceNotePage(BaseModel):
+    items: List[MaintenanceNote]
+    next_cursor: Optional[str] = None
+
+class AlertPage(BaseModel):
+    items: List[Alert]
+    next_cursor: Optional[str] = None
+
+class IncidentPage(BaseModel):
+    items: List[Incident]
+    next_cursor: Optional[str] = None
+
 class AdminLogin(BaseModel):
     username: str
     password: str
@@ -188,16 +297,66 @@ class PasswordChange(BaseModel):
     new_password: str
 
 # Helper functions
+# Documents use their UUID as _id, stored as BSON binary; the string id is kept on the document for the API
+def uuid_key(doc_id: str) -> Binary:
+    return Binary.from_uuid(uuid.UUID(doc_id))
+
+def by_id(doc_id: str) -> dict:
+    """Filter matching the document with the given API id."""
+    try:
+        return {"_id": uuid_key(doc_id)}
+    except ValueError:
+        # Not a UUID, so none of ours; no document has a null _id
+        return {"_id": None}
+
+def to_document(obj: BaseModel) -> dict:
+    """The document to insert for a model instance."""
+    doc = obj.dict()
+    return {"_id": uuid_key(doc["id"]), **doc}
+
+def naive_utc(value: datetime) -> datetime:
+    """Stored datetimes are naive UTC; convert aware query parameters to match."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def next_refill_due_from(last_refill: datetime) -> datetime:
+    return last_refill + timedelta(days=365)
+
+def next_pressure_test_due_from(last_pressure_test: datetime) -> datetime:
+    return last_pressure_test + timedelta(days=365*3)
+
 def calculate_due_dates(last_refill: datetime, last_pressure_test: datetime):
-    next_refill_due = last_refill + timedelta(days=365)
-    next_pressure_test_due = last_pressure_test + timedelta(days=365*3)
-    return next_refill_due, next_pressure_test_due
+    return next_refill_due_from(last_refill), next_pressure_test_due_from(last_pressure_test)
+
+# is_extinguisher_due treats anything less than 31 whole days away as due
+DUE_WINDOW = timedelta(days=31)
+
+DUE_FIELDS = {
+    DueKind.REFILL: "next_refill_due",
+    DueKind.PRESSURE_TEST: "next_pressure_test_due",
+}
+
+async def update_and_merge(collection, query: dict, changes: dict):
+    """Apply a $set in a single round trip; returns (before, after), or (None, None) if nothing matched.
+
+    The previous document is what the dashboard counters need, and for a plain $set the
+    new document is exactly the previous one with the changes applied.
+    """
+    before = await collection.find_one_and_update(
+        query,
+        {"$set": changes},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None, None
+    return before, {**before, **changes}
 
-def check_extinguisher_status(extinguisher: FireExtinguisher) -> ExtinguisherStatus:
+def check_extinguisher_status(extinguisher: FireExtinguisher, now: Optional[datetime] = None) -> ExtinguisherStatus:
     if extinguisher.status == ExtinguisherStatus.TRIGGERED:
         return ExtinguisherStatus.TRIGGERED
     
-    now = datetime.utcnow()
+    now = now or datetime.utcnow()
     days_until_refill = (extinguisher.next_refill_due - now).days
     days_until_pressure_test = (extinguisher.next_pressure_test_due - now).days
     
@@ -208,8 +367,8 @@ def check_extinguisher_status(extinguisher: FireExtinguisher) -> ExtinguisherSta
     else:
         return ExtinguisherStatus.ACTIVE
 
-def is_extinguisher_due(extinguisher: FireExtinguisher) -> dict:
-    now = datetime.utcnow()
+def is_extinguisher_due(extinguisher: FireExtinguisher, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.utcnow()
     days_until_refill = (extinguisher.next_refill_due - now).days
     days_until_pressure_test = (extinguisher.next_pressure_test_due - now).days
     
@@ -220,17 +379,956 @@ def is_extinguisher_due(extinguisher: FireExtinguisher) -> dict:
         "days_until_pressure_test": days_until_pressure_test
     }
 
-def check_maintenance_item_status(item: MaintenanceItem) -> MaintenanceItemStatus:
+def check_maintenance_item_status(item: MaintenanceItem, now: Optional[datetime] = None) -> MaintenanceItemStatus:
     if item.status in [MaintenanceItemStatus.COMPLETED, MaintenanceItemStatus.IN_PROGRESS]:
         return item.status
     
     if item.due_date:
-        now = datetime.utcnow()
+        now = now or datetime.utcnow()
         if now > item.due_date:
             return MaintenanceItemStatus.OVERDUE
     
     return MaintenanceItemStatus.PENDING
 
+def extinguisher_view(doc: dict) -> FireExtinguisher:
+    # status and days_until_* are materialized on the document, see below
+    return FireExtinguisher(**doc)
+
+def maintenance_item_view(doc: dict) -> MaintenanceItem:
+    # overdue is materialized on the document, see below
+    return MaintenanceItem(**doc)
+
+# Materialized extinguisher status
+# status and days_until_* are stored on every extinguisher document: the write paths set them
+# through update_extinguisher, and sweep_extinguisher_status keeps them current as time passes.
+EXTINGUISHER_SWEEP_INTERVAL = int(os.environ.get("EXTINGUISHER_SWEEP_INTERVAL", "3600"))
+MILLISECONDS_PER_DAY = 86400000
+
+def extinguisher_due_fields(extinguisher: FireExtinguisher, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.utcnow()
+    due_status = is_extinguisher_due(extinguisher, now)
+    return {
+        "status": check_extinguisher_status(extinguisher, now),
+        "days_until_refill": due_status["days_until_refill"],
+        "days_until_pressure_test": due_status["days_until_pressure_test"],
+    }
+
+def days_until_expression(field: str, now: datetime) -> dict:
+    # Whole days rounded down, like timedelta.days
+    return {"$toInt": {"$floor": {"$divide": [{"$subtract": [f"${field}", now]}, MILLISECONDS_PER_DAY]}}}
+
+def extinguisher_due_stage(now: datetime) -> dict:
+    """Pipeline stage computing extinguisher_due_fields inside the database."""
+    cutoff = now + DUE_WINDOW
+    return {"$set": {
+        "days_until_refill": days_until_expression("next_refill_due", now),
+        "days_until_pressure_test": days_until_expression("next_pressure_test_due", now),
+        "status": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$status", ExtinguisherStatus.TRIGGERED.value]}, "then": ExtinguisherStatus.TRIGGERED.value},
+                {"case": {"$lt": ["$next_refill_due", cutoff]}, "then": ExtinguisherStatus.REFILL_DUE.value},
+                {"case": {"$lt": ["$next_pressure_test_due", cutoff]}, "then": ExtinguisherStatus.PRESSURE_TEST_DUE.value},
+            ],
+            "default": ExtinguisherStatus.ACTIVE.value,
+        }},
+    }}
+
+async def update_and_recompute(collection, query: dict, changes: dict, stage: dict) -> Optional[dict]:
+    """The $set of update_and_merge followed by a pipeline stage recomputing materialized fields; returns the previous document."""
+    return await collection.find_one_and_update(
+        query,
+        [
+            {"$set": {key: {"$literal": value} for key, value in changes.items()}},
+            stage,
+        ],
+        return_document=ReturnDocument.BEFORE
+    )
+
+async def update_extinguisher(query: dict, changes: dict):
+    """update_and_merge for extinguishers; the materialized fields are recomputed in the same round trip."""
+    now = datetime.utcnow()
+    before = await update_and_recompute(db.fire_extinguishers, query, changes, extinguisher_due_stage(now))
+    if before is None:
+        return None, None
+    after = {**before, **changes}
+    after.update(extinguisher_due_fields(FireExtinguisher(**after), now))
+    return before, after
+
+async def sweep_extinguisher_status() -> int:
+    """Bring stored statuses and day counts up to date; returns the number of documents changed."""
+    now = datetime.utcnow()
+    cutoff = now + DUE_WINDOW
+    # One update_many per target status, keyed on the due date thresholds; the queries are disjoint
+    thresholds = {
+        ExtinguisherStatus.REFILL_DUE: {"next_refill_due": {"$lt": cutoff}},
+        ExtinguisherStatus.PRESSURE_TEST_DUE: {"next_refill_due": {"$gte": cutoff}, "next_pressure_test_due": {"$lt": cutoff}},
+        ExtinguisherStatus.ACTIVE: {"next_refill_due": {"$gte": cutoff}, "next_pressure_test_due": {"$gte": cutoff}},
+    }
+    transitions = []
+    changed = 0
+    recount = False
+    for target, due_query in thresholds.items():
+        query = {**due_query, "status": {"$nin": [ExtinguisherStatus.TRIGGERED, target]}}
+        # The counters need the statuses being left
+        rows = await db.fire_extinguishers.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        if not rows:
+            continue
+        result = await db.fire_extinguishers.update_many(query, {"$set": {"status": target, "updated_at": now}})
+        changed += result.modified_count
+        if result.modified_count != sum(row["count"] for row in rows):
+            # Another worker's sweep or a concurrent write moved some of these; the counts are off
+            recount = True
+            continue
+        for row in rows:
+            transitions.extend([(row["_id"], target)] * row["count"])
+    
+    # Day counts tick over for everything, so only documents holding a stale value are rewritten
+    days = {
+        "days_until_refill": days_until_expression("next_refill_due", now),
+        "days_until_pressure_test": days_until_expression("next_pressure_test_due", now),
+    }
+    result = await db.fire_extinguishers.update_many(
+        {"$expr": {"$or": [{"$ne": [f"${field}", expression]} for field, expression in days.items()]}},
+        [{"$set": {**days, "updated_at": now}}]
+    )
+    changed += result.modified_count
+    
+    if changed:
+        await bump_counters_bulk("extinguishers", transitions)
+        if recount:
+            await reconcile_dashboard_counters()
+        await bump_version("fire_extinguishers")
+        # No id: clients reload the collection
+        publish_change("fire_extinguishers", "extinguisher.swept", None)
+    return changed
+
+# Materialized maintenance status
+# Pending items past their due date are stored as overdue: update_maintenance keeps single
+# writes consistent and sweep_overdue_maintenance moves items as their due dates pass.
+MAINTENANCE_SWEEP_INTERVAL = int(os.environ.get("MAINTENANCE_SWEEP_INTERVAL", "300"))
+
+def maintenance_status_stage(now: datetime) -> dict:
+    """Pipeline stage computing check_maintenance_item_status inside the database."""
+    settled = [MaintenanceItemStatus.COMPLETED.value, MaintenanceItemStatus.IN_PROGRESS.value]
+    return {"$set": {
+        "status": {"$switch": {
+            "branches": [
+                {"case": {"$in": ["$status", settled]}, "then": "$status"},
+                # Anything above null is a due date; null and missing mean no due date
+                {"case": {"$and": [{"$gt": ["$due_date", None]}, {"$lt": ["$due_date", now]}]}, "then": MaintenanceItemStatus.OVERDUE.value},
+            ],
+            "default": MaintenanceItemStatus.PENDING.value,
+        }},
+    }}
+
+async def update_maintenance(query: dict, changes: dict):
+    """update_and_merge for maintenance items; the status is recomputed in the same round trip."""
+    now = datetime.utcnow()
+    before = await update_and_recompute(db.maintenance_items, query, changes, maintenance_status_stage(now))
+    if before is None:
+        return None, None
+    after = {**before, **changes}
+    after["status"] = check_maintenance_item_status(MaintenanceItem(**after), now)
+    return before, after
+
+async def sweep_overdue_maintenance() -> int:
+    """Move pending items past their due date to overdue (and back if the date moved); returns the number changed."""
+    now = datetime.utcnow()
+    # Both filters are served by the (status, due_date) index
+    moves = [
+        (MaintenanceItemStatus.PENDING, MaintenanceItemStatus.OVERDUE, {"due_date": {"$lt": now}}),
+        (MaintenanceItemStatus.OVERDUE, MaintenanceItemStatus.PENDING, {"$or": [{"due_date": {"$gte": now}}, {"due_date": None}]}),
+    ]
+    transitions = []
+    for old_status, new_status, due_query in moves:
+        result = await db.maintenance_items.update_many(
+            {"status": old_status, **due_query},
+            {"$set": {"status": new_status, "updated_at": now}}
+        )
+        transitions.extend([(old_status, new_status)] * result.modified_count)
+    
+    if transitions:
+        await bump_counters_bulk("maintenance", transitions)
+        await bump_version("maintenance_items")
+        publish_change("maintenance_items", "maintenance_item.swept", None)
+    return len(transitions)
+
+# Collection versions
+# A counter per collection, bumped on every write. Read endpoints derive their ETag from
+# it, so an unchanged poll is answered with 304 without reading or serializing documents.
+async def increment_versions(collections: List[str]):
+    result = await db.collection_versions.update_many({"_id": {"$in": collections}}, {"$inc": {"version": 1}})
+    if result.matched_count < len(collections):
+        # First write to a collection; the counters that exist were incremented above
+        await asyncio.gather(*(
+            db.collection_versions.update_one(
+                {"_id": collection},
+                # The epoch keeps ETags from repeating if the counters are ever reset
+                {"$setOnInsert": {"version": 1, "epoch": str(uuid.uuid4())}},
+                upsert=True
+            )
+            for collection in collections
+        ))
+
+async def bump_versions(*collections: str):
+    """Bump the versions of every collection a write touched with one update, invalidating their caches alongside."""
+    collections = list(dict.fromkeys(collections))
+    await asyncio.gather(increment_versions(collections), *(invalidate_cache(collection) for collection in collections))
+
+async def bump_version(collection: str):
+    await bump_versions(collection)
+
+async def check_etag(request: Request, response: Response, *collections: str) -> Optional[Response]:
+    """Return a 304 response if the client's copy is current, otherwise set the ETag on response."""
+    versions = await db.collection_versions.find({"_id": {"$in": list(collections)}}).to_list(None)
+    versions = {doc["_id"]: f"{doc.get('epoch')}:{doc['version']}" for doc in versions}
+    parts = [request.url.path, str(request.url.query)] + [versions.get(name, "0") for name in collections]
+    etag = '"' + hashlib.sha1("|".join(parts).encode()).hexdigest() + '"'
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Change events
+# Writes are fanned out to /api/events subscribers of this process as JSON messages
+# {"collection", "type", "id", "data"}; data is the document as the read endpoints return it.
+# With a REDIS_URL, ChangeEventRelay passes them on to the subscribers of the other workers.
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+# A batch changing more documents of one collection is announced with a single event without an id
+# (clients reload the collection); kept well below EVENT_QUEUE_SIZE so a batch can't overflow a stream
+EVENT_BATCH_THRESHOLD = 20
+EVENT_RELAY_QUEUE_SIZE = 1000
+
+class EventBroker:
+    def __init__(self):
+        self.subscribers = set()
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+    
+    def publish(self, message: str):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow client: end its stream; EventSource reconnects and the client reloads
+                self.disconnect(queue)
+    
+    def disconnect(self, queue: asyncio.Queue):
+        self.unsubscribe(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+    
+    def disconnect_all(self):
+        """End every stream; clients reconnect and reload, catching up on whatever they missed."""
+        for queue in list(self.subscribers):
+            self.disconnect(queue)
+
+event_broker = EventBroker()
+
+class RedisListener:
+    """This worker's one pub/sub subscription, dispatching each channel to the handler registered for it.
+    
+    A handler has receive(data), called with the messages the other workers publish, and
+    subscribed(missed), called whenever the subscription is set up; missed is True after it was lost.
+    """
+    
+    def __init__(self, redis):
+        self.redis = redis
+        self.handlers = {}
+        # Lets a worker skip its own messages
+        self.origin = str(uuid.uuid4())
+    
+    def register(self, channel: str, handler):
+        self.handlers[channel] = handler
+    
+    async def publish(self, channel: str, data: dict):
+        await self.redis.publish(channel, json.dumps({"origin": self.origin, **data}))
+    
+    async def run(self):
+        missed = False
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(*self.handlers)
+                    for handler in self.handlers.values():
+                        await handler.subscribed(missed)
+                    missed = False
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        if data["origin"] == self.origin:
+                            continue
+                        channel = message["channel"]
+                        if isinstance(channel, bytes):
+                            channel = channel.decode()
+                        await self.handlers[channel].receive(data)
+            except RedisError as e:
+                logger.error(f"Redis subscription lost, retrying: {e}")
+                missed = True
+                await asyncio.sleep(1)
+
+class ChangeEventRelay:
+    """Relays change events between workers over the RedisListener."""
+    CHANNEL = "change-events"
+    
+    def __init__(self, listener: RedisListener, broker: EventBroker):
+        self.listener = listener
+        self.broker = broker
+        # Messages wait here for the sender, so publish_change stays synchronous and events keep their order
+        self.outbox = asyncio.Queue(maxsize=EVENT_RELAY_QUEUE_SIZE)
+        listener.register(self.CHANNEL, self)
+    
+    def send(self, message: str):
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Change event relay is backed up, dropping an event for the other workers")
+    
+    async def run(self):
+        while True:
+            message = await self.outbox.get()
+            try:
+                await self.listener.publish(self.CHANNEL, {"message": message})
+            except RedisError as e:
+                logger.error(f"Relaying a change event failed: {e}")
+    
+    async def subscribed(self, missed: bool):
+        # Events sent while we were not listening are lost; make clients reload
+        if missed:
+            self.broker.disconnect_all()
+    
+    async def receive(self, data: dict):
+        self.broker.publish(data["message"])
+
+async def emit_change(collection: str, event_type: str, doc_id: str, data=None):
+    """Notify listeners that a document changed; called by every write path after the write succeeds."""
+    await bump_version(collection)
+    publish_change(collection, event_type, doc_id, data)
+
+def publish_change(collection: str, event_type: str, doc_id: str, data=None):
+    """Publish an event without bumping the version; batch writers bump once for the whole batch."""
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k != "_id"}
+    message = json.dumps({
+        "collection": collection,
+        "type": event_type,
+        "id": doc_id,
+        "data": jsonable_encoder(data),
+    })
+    event_broker.publish(message)
+    if event_relay is not None:
+        event_relay.send(message)
+
+def publish_changes(collection: str, bulk_event_type: str, changes: List[tuple]):
+    """publish_change for (event_type, doc_id, data) of a batch, or one bulk_event_type event for a large one."""
+    if len(changes) > EVENT_BATCH_THRESHOLD:
+        publish_change(collection, bulk_event_type, None)
+        return
+    for event_type, doc_id, data in changes:
+        publish_change(collection, event_type, doc_id, data)
+
+# Pagination
+MAX_PAGE_SIZE = 500
+# Cap of the plain-array responses of list endpoints called without ?limit=; when a list is cut
+# off, the cursor of the rest is sent in the X-Next-Cursor header
+DEFAULT_LIST_LIMIT = int(os.environ.get("DEFAULT_LIST_LIMIT", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Headers kept when a response is rendered directly or cached
+PASSED_HEADERS = ("etag", "cache-control", NEXT_CURSOR_HEADER.lower())
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    payload = json.dumps([sort_value.isoformat(), doc_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(sort_value, str) or not isinstance(doc_id, str):
+            raise ValueError("cursor values must be strings")
+        return datetime.fromisoformat(sort_value), uuid_key(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def find_page(collection, query: dict, sort_field: str, direction: int, limit: Optional[int], after: Optional[str], projection: Optional[dict] = None):
+    """Keyset pagination on (sort_field, _id); returns (docs, next_cursor).
+
+    Without a limit at most DEFAULT_LIST_LIMIT documents are returned; next_cursor is None
+    unless there are more. A projection must keep sort_field and id. Identical concurrent calls share one query and
+    its result (see SingleFlight), so callers must not modify the returned documents.
+    """
+    if after:
+        sort_value, doc_key = decode_cursor(after)
+        op = "$gt" if direction == ASCENDING else "$lt"
+        query = {"$and": [query, {"$or": [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, "_id": {op: doc_key}},
+        ]}]}
+    
+    limit = limit or DEFAULT_LIST_LIMIT
+    
+    async def run():
+        cursor = collection.find(query, projection or {"_id": 0}).sort([(sort_field, direction), ("_id", direction)])
+        # Fetch one extra document to know whether another page exists
+        docs = await cursor.limit(limit + 1).to_list(limit + 1)
+        if len(docs) <= limit:
+            return docs, None
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1][sort_field], docs[-1]["id"])
+    
+    key = ("find_page", collection.name, repr(query), sort_field, direction, limit, repr(projection))
+    return await read_flight.do(key, [collection.name], run)
+
+# Single-flight reads
+# Identical reads running at the same time share one database query and its result. A write to a
+# collection detaches the reads in flight on it, so requests arriving after the write query afresh.
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+class SingleFlight:
+    def __init__(self):
+        self.flights = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0}
+    
+    async def do(self, key, tags, fn):
+        """Return the result of fn(), joining an identical call (same key) that is already running."""
+        if not SINGLE_FLIGHT_ENABLED:
+            return await fn()
+        self.stats["calls"] += 1
+        flight = self.flights.get(key)
+        if flight is None:
+            self.stats["executions"] += 1
+            flight = (asyncio.ensure_future(fn()), set(tags))
+            self.flights[key] = flight
+            flight[0].add_done_callback(lambda task: self._land(key, flight))
+        else:
+            self.stats["coalesced"] += 1
+        # A caller going away must not cancel the query for the others
+        return await asyncio.shield(flight[0])
+    
+    def _land(self, key, flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        task = flight[0]
+        if not task.cancelled():
+            # Mark a failure as retrieved even if every caller went away
+            task.exception()
+    
+    def invalidate(self, tag: str):
+        for key in [key for key, (_, tags) in self.flights.items() if tag in tags]:
+            del self.flights[key]
+    
+    def info(self) -> dict:
+        return {**self.stats, "in_flight": len(self.flights)}
+
+read_flight = SingleFlight()
+
+# Response serialization
+# Documents only ever get into Mongo through the models above, so list endpoints can trust them:
+# fill in defaults for fields older documents lack and hand them straight to orjson, instead of
+# building a model per row and having response_model validate it all over again.
+FAST_SERIALIZATION = orjson is not None and os.environ.get("FAST_SERIALIZATION", "true").lower() == "true"
+
+@functools.lru_cache(maxsize=None)
+def model_defaults(model) -> dict:
+    # Fields with a default factory (ids, timestamps) are written on insert and never missing
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+
+def serialize_docs(model, docs: List[dict]) -> list:
+    if not FAST_SERIALIZATION:
+        return [model(**doc) for doc in docs]
+    defaults = model_defaults(model)
+    return [{**defaults, **doc} for doc in docs]
+
+def json_response(response: Response, content):
+    """Render content directly, bypassing response_model; keeps the headers check_etag set."""
+    headers = {name: value for name, value in response.headers.items() if name in PASSED_HEADERS}
+    if orjson is None:
+        return JSONResponse(jsonable_encoder(content), headers=headers)
+    return ORJSONResponse(content, headers=headers)
+
+def list_response(response: Response, model, docs: List[dict], next_cursor: Optional[str], paged: bool, sparse: bool = False):
+    """Body of a list endpoint: the plain array, or a page when the client paginates.
+
+    A plain array cut off at DEFAULT_LIST_LIMIT carries the cursor of the rest in X-Next-Cursor.
+    sparse documents (?fields=) are returned exactly as projected.
+    """
+    items = docs if sparse else serialize_docs(model, docs)
+    content = {"items": items, "next_cursor": next_cursor} if paged else items
+    if not paged and next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if not FAST_SERIALIZATION and not sparse:
+        return content
+    return json_response(response, content)
+
+# Sparse fieldsets
+def fields_projection(model, fields: Optional[str], *required: str) -> Optional[dict]:
+    """Projection for a ?fields=a,b list, or None for the endpoint's default view.
+
+    required fields (the id and sort key, which pagination needs) are always included.
+    """
+    if fields is None:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(model.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    projection = {"_id": 0}
+    projection.update({name: 1 for name in (*required, *names)})
+    return projection
+
+# Maintenance notes
+# Notes are documents of their own in maintenance_notes, read a page at a time through
+# /maintenance-items/{id}/notes; items only carry note_count and latest_note. Items written
+# before that embedded their notes in a notes array, which migrate_embedded_notes moves out.
+NOTE_MIGRATION_BATCH_SIZE = int(os.environ.get("NOTE_MIGRATION_BATCH_SIZE", "200"))
+DUPLICATE_KEY = 11000
+
+async def migrate_embedded_notes() -> int:
+    """Move embedded notes to maintenance_notes in batches; returns how many items were migrated.
+
+    Safe to run concurrently and to interrupt: notes keep their id as _id, so a note copied
+    twice is rejected as a duplicate, and an item's array is only removed once it is copied.
+    """
+    migrated = 0
+    while True:
+        items = await db.maintenance_items.find(
+            {"notes": {"$exists": True}},
+            projection={"id": 1, "notes": 1, "note_count": 1}
+        ).limit(NOTE_MIGRATION_BATCH_SIZE).to_list(NOTE_MIGRATION_BATCH_SIZE)
+        if not items:
+            break
+        notes, updates = [], []
+        for item in items:
+            item_notes = [MaintenanceNote(**note, item_id=item["id"]) for note in item.get("notes") or []]
+            notes.extend(item_notes)
+            cleanup = {"$unset": {"notes": ""}}
+            if "note_count" not in item:
+                cleanup["$set"] = {"note_count": len(item_notes)}
+            updates.append(UpdateOne({"_id": item["_id"]}, cleanup))
+            if item_notes:
+                # Unless a note was added through the new path meanwhile
+                updates.append(UpdateOne(
+                    {"_id": item["_id"], "latest_note": None},
+                    {"$set": {"latest_note": item_notes[-1].dict()}}
+                ))
+        if notes:
+            try:
+                await db.maintenance_notes.insert_many([to_document(note) for note in notes], ordered=False)
+            except BulkWriteError as e:
+                if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                    raise
+        await db.maintenance_items.bulk_write(updates)
+        migrated += len(items)
+    if migrated:
+        logger.info(f"Moved the embedded notes of {migrated} maintenance items to maintenance_notes")
+        await bump_version("maintenance_items")
+    return migrated
+
+# Response cache
+# Rendered responses of the public read endpoints, keyed by path and query string. Entries are
+# tagged with the collections they were built from and dropped by bump_version, so a cached
+# response never outlives a write; the TTL and size limit only bound what idle keys hold on to.
+# CACHE_BACKEND=redis shares one cache between workers; with the in-memory backend and a
+# REDIS_URL, invalidations are relayed to the other workers over pub/sub.
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+REDIS_URL = os.environ.get("REDIS_URL")
+
+class CacheBackend(ABC):
+    """Storage for the response cache; entries are {"body": bytes, "headers": dict}."""
+    # Whether every worker sees the same entries (then relayed invalidations need no local work)
+    shared = False
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[dict]:
+        ...
+    
+    @abstractmethod
+    async def generation(self, tags) -> tuple:
+        """Opaque marker that changes whenever one of tags is invalidated."""
+    
+    @abstractmethod
+    async def put(self, key: str, tags, generation: tuple, entry: dict):
+        """Store entry unless one of tags was invalidated since generation was taken."""
+    
+    @abstractmethod
+    async def invalidate(self, tag: str):
+        ...
+    
+    @abstractmethod
+    async def clear(self):
+        ...
+    
+    @abstractmethod
+    async def info(self) -> dict:
+        ...
+
+class InMemoryCacheBackend(CacheBackend):
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+    
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is not None and entry["expires_at"] <= time.monotonic():
+            del self.entries[key]
+            self.stats["expirations"] += 1
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+    
+    async def generation(self, tags) -> tuple:
+        return tuple(self.generations.get(tag, 0) for tag in tags)
+    
+    async def put(self, key: str, tags, generation: tuple, entry: dict):
+        if await self.generation(tags) != generation:
+            return
+        self.entries[key] = {**entry, "tags": set(tags), "expires_at": time.monotonic() + self.ttl}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    async def invalidate(self, tag: str):
+        self.generations[tag] = self.generations.get(tag, 0) + 1
+        stale = [key for key, entry in self.entries.items() if tag in entry["tags"]]
+        for key in stale:
+            del self.entries[key]
+        self.stats["invalidations"] += len(stale)
+    
+    async def clear(self):
+        for tag in {tag for entry in self.entries.values() for tag in entry["tags"]}:
+            await self.invalidate(tag)
+    
+    async def info(self) -> dict:
+        return {"backend": "memory", **self.stats, "size": len(self.entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl}
+
+class RedisCacheBackend(CacheBackend):
+    """Entries in Redis with the TTL as expiry; eviction is left to the server's maxmemory policy."""
+    shared = True
+    
+    def __init__(self, redis, ttl: float, prefix: str = "response-cache:"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        # Per worker
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+    
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+    
+    def _generation_key(self, tag: str) -> str:
+        return f"{self.prefix}generation:{tag}"
+    
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+    
+    async def get(self, key: str) -> Optional[dict]:
+        try:
+            stored = await self.redis.hgetall(self._entry_key(key))
+        except RedisError as e:
+            # An unreachable cache is a miss, not a failed request
+            self.stats["errors"] += 1
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+        if not stored:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return {"body": stored[b"body"], "headers": json.loads(stored[b"headers"])}
+    
+    async def generation(self, tags) -> tuple:
+        if not tags:
+            return ()
+        try:
+            values = await self.redis.mget([self._generation_key(tag) for tag in tags])
+        except RedisError:
+            # Never matches, so nothing computed now gets stored
+            return (None,)
+        return tuple(int(value or 0) for value in values)
+    
+    async def put(self, key: str, tags, generation: tuple, entry: dict):
+        entry_key = self._entry_key(key)
+        generation_keys = [self._generation_key(tag) for tag in tags]
+        ttl_ms = int(self.ttl * 1000)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                # An invalidation between this check and EXEC aborts the transaction
+                await pipe.watch(*generation_keys)
+                values = await pipe.mget(generation_keys) if generation_keys else []
+                if tuple(int(value or 0) for value in values) != generation:
+                    return
+                pipe.multi()
+                pipe.hset(entry_key, mapping={"body": entry["body"], "headers": json.dumps(entry["headers"])})
+                pipe.pexpire(entry_key, ttl_ms)
+                for tag in tags:
+                    pipe.sadd(self._tag_key(tag), entry_key)
+                    pipe.pexpire(self._tag_key(tag), ttl_ms)
+                await pipe.execute()
+        except WatchError:
+            pass
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Response cache write failed: {e}")
+    
+    async def invalidate(self, tag: str):
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(self._generation_key(tag))
+                pipe.smembers(self._tag_key(tag))
+                pipe.delete(self._tag_key(tag))
+                _, keys, _ = await pipe.execute()
+            if keys:
+                # Keys of entries that expired or went with another tag are already gone
+                self.stats["invalidations"] += await self.redis.delete(*keys)
+        except RedisError as e:
+            # Entries built from this tag may be served until they expire
+            self.stats["errors"] += 1
+            logger.error(f"Response cache invalidation of {tag} failed: {e}")
+    
+    async def clear(self):
+        async for key in self.redis.scan_iter(match=f"{self.prefix}tag:*"):
+            await self.invalidate(key.decode()[len(self._tag_key("")):])
+    
+    async def info(self) -> dict:
+        return {"backend": "redis", **self.stats, "ttl_seconds": self.ttl}
+
+class CacheInvalidationBus:
+    """Relays invalidations to the other workers over the RedisListener."""
+    CHANNEL = "response-cache-invalidation"
+    
+    def __init__(self, listener: RedisListener, backend: CacheBackend):
+        self.listener = listener
+        self.backend = backend
+        listener.register(self.CHANNEL, self)
+    
+    async def publish(self, tag: str):
+        try:
+            await self.listener.publish(self.CHANNEL, {"tag": tag})
+        except RedisError as e:
+            logger.error(f"Publishing cache invalidation of {tag} failed: {e}")
+    
+    async def subscribed(self, missed: bool):
+        # Invalidations sent while we were not listening are lost; start over
+        if not self.backend.shared:
+            await self.backend.clear()
+    
+    async def receive(self, data: dict):
+        read_flight.invalidate(data["tag"])
+        if not self.backend.shared:
+            await self.backend.invalidate(data["tag"])
+
+redis_client = aioredis.from_url(REDIS_URL) if REDIS_URL and aioredis is not None else None
+if CACHE_BACKEND == "redis" and redis_client is not None:
+    cache_backend = RedisCacheBackend(redis_client, RESPONSE_CACHE_TTL)
+else:
+    cache_backend = InMemoryCacheBackend(RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE)
+redis_listener = RedisListener(redis_client) if redis_client is not None else None
+cache_bus = CacheInvalidationBus(redis_listener, cache_backend) if redis_listener is not None else None
+event_relay = ChangeEventRelay(redis_listener, event_broker) if redis_listener is not None else None
+
+async def invalidate_cache(tag: str):
+    read_flight.invalidate(tag)
+    await cache_backend.invalidate(tag)
+    if cache_bus is not None:
+        await cache_bus.publish(tag)
+
+def cached_response(*tags: str):
+    """Serve a read endpoint through the response cache; the endpoint must take request and response."""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            if RESPONSE_CACHE_TTL <= 0:
+                return await endpoint(*args, **kwargs)
+            request = kwargs["request"]
+            key = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+            entry = await cache_backend.get(key)
+            if entry is None:
+                generation = await cache_backend.generation(tags)
+                result = await endpoint(*args, **kwargs)
+                if isinstance(result, Response):
+                    if result.status_code != 200:
+                        return result
+                    body, headers = result.body, result.headers
+                else:
+                    body, headers = JSONResponse(jsonable_encoder(result)).body, kwargs["response"].headers
+                headers = {name: value for name, value in headers.items() if name in PASSED_HEADERS}
+                entry = {"body": body, "headers": headers}
+                await cache_backend.put(key, tags, generation, entry)
+            
+            etag = entry["headers"].get("etag")
+            if etag and etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+                return Response(status_code=304, headers=entry["headers"])
+            return Response(entry["body"], media_type="application/json", headers=entry["headers"])
+        return wrapper
+    return decorator
+
+# Delta sync
+# Deletes leave a tombstone so /api/sync can report them; tombstones expire after the retention period.
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "30"))
+# Writes in flight when a sync runs may commit with an earlier updated_at; re-send that window next time
+SYNC_GRACE_SECONDS = 5
+
+async def backfill_updated_at():
+    """Alerts from before they had updated_at get their timestamp, so /api/sync can page them on it."""
+    await db.alerts.update_many({"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$timestamp"}}])
+
+async def record_deletions(collection: str, doc_ids: List[str]):
+    # Keyed like the deleted documents, so /api/sync pages tombstones as it does the collections
+    # and deleting again (e.g. a retried archive batch) doesn't add a second tombstone
+    now = datetime.utcnow()
+    await db.tombstones.bulk_write(
+        [
+            UpdateOne({"_id": uuid_key(doc_id)}, {"$set": {"collection": collection, "id": doc_id, "deleted_at": now}}, upsert=True)
+            for doc_id in doc_ids
+        ],
+        ordered=False
+    )
+
+async def record_deletion(collection: str, doc_id: str):
+    await record_deletions(collection, [doc_id])
+
+# Index registry
+# Every filter/sort used by the endpoints below should be backed by one of these.
+# Indexes are created on startup; /admin/indexes reports drift against this list.
+# Lookups by id use the built-in _id index (see uuid_key), which also breaks sort ties.
+INDEXES = {
+    "smoke_detectors": [
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at__id"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at__id"),
+    ],
+    "fire_extinguishers": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="status_created_at__id"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at__id"),
+        # Thresholds of the status sweep and the keyset order of /fire-extinguishers/due
+        IndexModel([("next_refill_due", ASCENDING), ("_id", ASCENDING)], name="next_refill_due__id"),
+        IndexModel([("next_pressure_test_due", ASCENDING), ("_id", ASCENDING)], name="next_pressure_test_due__id"),
+        IndexModel([("dispatch_status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="dispatch_status_created_at__id"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at__id"),
+    ],
+    "maintenance_items": [
+        IndexModel([("status", ASCENDING), ("due_date", ASCENDING)], name="status_due_date"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="status_created_at__id_desc"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at__id_desc"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at__id"),
+    ],
+    "maintenance_notes": [
+        IndexModel([("item_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="item_id_created_at__id"),
+    ],
+    "alerts": [
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp__id_desc"),
+        # ?acknowledged=, the dashboard's unacknowledged alerts and the retention job
+        IndexModel([("acknowledged", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="acknowledged_timestamp__id_desc"),
+        IndexModel([("detector_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="detector_id_timestamp__id_desc"),
+        IndexModel([("extinguisher_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="extinguisher_id_timestamp__id_desc"),
+        IndexModel([("incident_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="incident_id_timestamp__id_desc"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at__id"),
+    ],
+    "incidents": [
+        # The open incident a trigger joins
+        IndexModel([("zone", ASCENDING), ("acknowledged", ASCENDING), ("last_seen", DESCENDING)], name="zone_acknowledged_last_seen_desc"),
+        IndexModel([("started_at", DESCENDING), ("_id", DESCENDING)], name="started_at__id_desc"),
+        IndexModel([("acknowledged", ASCENDING), ("started_at", DESCENDING), ("_id", DESCENDING)], name="acknowledged_started_at__id_desc"),
+        # The dashboard's open incidents
+        IndexModel([("acknowledged", ASCENDING), ("last_seen", DESCENDING)], name="acknowledged_last_seen_desc"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at__id"),
+    ],
+    "alerts_archive": [
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp__id_desc"),
+        IndexModel([("detector_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="detector_id_timestamp__id_desc"),
+        IndexModel([("extinguisher_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="extinguisher_id_timestamp__id_desc"),
+    ],
+    "tombstones": [
+        # Also expires tombstones once clients can no longer ask for changes that old
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 86400),
+        IndexModel([("deleted_at", ASCENDING), ("_id", ASCENDING)], name="deleted_at__id"),
+    ],
+}
+
+# Collections that held ObjectId-keyed documents before the switch to UUID keys (see migrate_uuid_ids.py)
+UUID_KEYED_COLLECTIONS = ["smoke_detectors", "fire_extinguishers", "maintenance_items", "alerts"]
+
+async def check_uuid_keys():
+    """Refuse to start on data migrate_uuid_ids.py has not re-keyed: by_id would 404 on all of it."""
+    unmigrated = [
+        name for name in UUID_KEYED_COLLECTIONS
+        if await db[name].find_one({"_id": {"$type": "objectId"}}, projection={"_id": 1})
+    ]
+    if unmigrated:
+        raise RuntimeError(
+            f"Documents in {', '.join(unmigrated)} still have ObjectId _ids; run migrate_uuid_ids.py before starting the server"
+        )
+
+async def ensure_indexes():
+    for collection_name, indexes in INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Don't block startup (e.g. duplicate ids prevent a unique index); /admin/indexes shows it as missing
+            logger.error(f"Failed to create indexes on {collection_name}: {e}")
+
+async def get_index_usage(collection_name: str) -> Optional[dict]:
+    try:
+        stats = await db[collection_name].aggregate([{"$indexStats": {}}]).to_list(None)
+    except OperationFailure:
+        # $indexStats is not available on every deployment
+        return None
+    return {stat["name"]: stat["accesses"]["ops"] for stat in stats}
+
+# Change event stream
+@api_router.get("/events")
+async def stream_events():
+    queue = event_broker.subscribe()
+    
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is None:
+                    break
+                yield f"data: {message}\n\n"
+        finally:
+            event_broker.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Authentication endpoints
 @api_router.post("/admin/login")
 async def admin_login(login_data: AdminLogin):
@@ -268,64 +1366,237 @@ async def change_password(password_data: PasswordChange, admin: str = Depends(ge
         detail="Invalid current password"
     )
 
+@api_router.get("/admin/indexes")
+async def get_index_report(admin: str = Depends(get_current_admin)):
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        present = await db[collection_name].index_information()
+        registered = [index.document["name"] for index in indexes]
+        usage = await get_index_usage(collection_name)
+        report[collection_name] = {
+            "present": sorted(present),
+            "missing": [name for name in registered if name not in present],
+            "unregistered": sorted(name for name in present if name != "_id_" and name not in registered),
+            # ops are counted since the last mongod restart; None when $indexStats is unavailable
+            "unused": None if usage is None else sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+        }
+    return report
+
 @api_router.get("/admin/reset-code")
 async def get_reset_code():
     return {"reset_code": RESET_CODE, "message": "Use this code to reset admin password"}
 
+# Alert coalescing
+# Repeat triggers of a device within ALERT_COALESCE_WINDOW_SECONDS of its open (unacknowledged)
+# alert's last_seen are folded into that alert, so a flapping detector or a retrying gateway
+# raises one alert with a growing occurrences count. 0 disables coalescing.
+ALERT_COALESCE_WINDOW_SECONDS = int(os.environ.get("ALERT_COALESCE_WINDOW_SECONDS", "300"))
+
+def coalesce_alert_update(alert: Alert, device_field: str):
+    """(filter, update) of the upsert folding alert into an open alert of its device.
+
+    alert stands for occurrences triggers seen from timestamp until last_seen.
+    """
+    window_start = alert.timestamp - timedelta(seconds=ALERT_COALESCE_WINDOW_SECONDS)
+    on_insert = to_document(alert)
+    for key in (device_field, "acknowledged", "occurrences", "last_seen", "updated_at"):
+        del on_insert[key]
+    return (
+        {device_field: getattr(alert, device_field), "acknowledged": False, "last_seen": {"$gte": window_start}},
+        {
+            "$inc": {"occurrences": alert.occurrences},
+            "$max": {"last_seen": alert.last_seen},
+            "$set": {"updated_at": alert.updated_at},
+            "$setOnInsert": on_insert,
+        }
+    )
+
+async def raise_alert(alert: Alert, device_field: str):
+    """Store alert, or fold it into its device's open alert; returns (alert document, created).
+
+    A single upsert, so it stays one write. Two first triggers racing each other can still
+    open two alerts; later triggers are folded into one of them.
+    """
+    alert.last_seen = alert.last_seen or alert.timestamp
+    if not ALERT_COALESCE_WINDOW_SECONDS:
+        await db.alerts.insert_one(to_document(alert))
+        return alert.dict(), True
+    query, update = coalesce_alert_update(alert, device_field)
+    doc = await db.alerts.find_one_and_update(
+        query, update,
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    return doc, doc["id"] == alert.id
+
+# Incident correlation
+# Every trigger is correlated as it is raised: it joins the open incident of its zone whose last
+# trigger is at most INCIDENT_WINDOW_SECONDS older, or opens a new one, and its alert records the
+# incident. A spreading fire then shows up as one incident per floor instead of one alert per
+# detector. 0 disables correlation.
+INCIDENT_WINDOW_SECONDS = int(os.environ.get("INCIDENT_WINDOW_SECONDS", "900"))
+
+def incident_zone(location: str):
+    """(zone key, zone as written) of a location; locations read "<place> - <floor>"."""
+    label = location.rsplit(" - ", 1)[-1].strip()
+    return " ".join(label.lower().split()), label
+
+def correlate_incident_update(location: str, devices: dict, started_at: datetime, last_seen: datetime, occurrences: int, now: datetime):
+    """(filter, update) of the upsert adding triggers at location to its zone's open incident.
+
+    devices maps detector_ids/extinguisher_ids to the devices that triggered.
+    """
+    zone, label = incident_zone(location)
+    window_start = started_at - timedelta(seconds=INCIDENT_WINDOW_SECONDS)
+    incident = Incident(zone=zone, location=label, started_at=started_at, last_seen=last_seen, updated_at=now)
+    on_insert = to_document(incident)
+    for key in ("zone", "acknowledged", "occurrences", "started_at", "last_seen", "updated_at", "detector_ids", "extinguisher_ids"):
+        del on_insert[key]
+    return (
+        {"zone": zone, "acknowledged": False, "last_seen": {"$gte": window_start}},
+        {
+            "$inc": {"occurrences": occurrences},
+            "$min": {"started_at": started_at},
+            "$max": {"last_seen": last_seen},
+            "$addToSet": {field: {"$each": devices.get(field, [])} for field in ("detector_ids", "extinguisher_ids")},
+            "$set": {"updated_at": now},
+            "$setOnInsert": on_insert,
+        }
+    )
+
+async def correlate_incident(location: str, device_field: str, device_id: str, triggered_at: datetime):
+    """Add a trigger to its zone's incident; returns (incident document, created), or (None, False) when disabled."""
+    if not INCIDENT_WINDOW_SECONDS:
+        return None, False
+    query, update = correlate_incident_update(location, {device_field: [device_id]}, triggered_at, triggered_at, 1, datetime.utcnow())
+    incident_id = update["$setOnInsert"]["id"]
+    doc = await db.incidents.find_one_and_update(
+        query, update,
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    return doc, doc["id"] == incident_id
+
+async def correlate_incidents(alerts: List[Alert], now: datetime) -> List[tuple]:
+    """correlate_incident for a batch of alerts with one bulk upsert; sets incident_id on each alert.
+
+    Returns (incident document, created) per incident touched.
+    """
+    if not INCIDENT_WINDOW_SECONDS or not alerts:
+        return []
+    zones = {}
+    for alert in alerts:
+        location = alert.detector_location or alert.extinguisher_location
+        group = zones.setdefault(incident_zone(location)[0], {
+            "location": location,
+            "devices": {"detector_ids": [], "extinguisher_ids": []},
+            "started_at": alert.timestamp,
+            "last_seen": alert.last_seen or alert.timestamp,
+            "occurrences": 0,
+        })
+        if alert.detector_id:
+            group["devices"]["detector_ids"].append(alert.detector_id)
+        else:
+            group["devices"]["extinguisher_ids"].append(alert.extinguisher_id)
+        group["started_at"] = min(group["started_at"], alert.timestamp)
+        group["last_seen"] = max(group["last_seen"], alert.last_seen or alert.timestamp)
+        group["occurrences"] += alert.occurrences
+    updates = {
+        zone: correlate_incident_update(group["location"], group["devices"], group["started_at"], group["last_seen"], group["occurrences"], now)
+        for zone, group in zones.items()
+    }
+    await db.incidents.bulk_write(
+        [UpdateOne(query, update, upsert=True) for query, update in updates.values()],
+        ordered=False
+    )
+    # Every incident the upserts touched carries this batch's updated_at
+    touched = await db.incidents.find({"zone": {"$in": list(zones)}, "updated_at": now}, projection={"_id": 0}).to_list(None)
+    touched = {doc["zone"]: doc for doc in touched}
+    for alert in alerts:
+        incident = touched.get(incident_zone(alert.detector_location or alert.extinguisher_location)[0])
+        alert.incident_id = incident and incident["id"]
+    return [
+        (touched[zone], touched[zone]["id"] == update["$setOnInsert"]["id"])
+        for zone, (query, update) in updates.items() if zone in touched
+    ]
+
+def publish_incident(incident: Optional[dict], created: bool):
+    if incident is not None:
+        publish_change("incidents", "incident.opened" if created else "incident.updated", incident["id"], incident)
+
 # Public Smoke Detector endpoints (read-only)
-@api_router.get("/smoke-detectors", response_model=List[SmokeDetector])
-async def get_smoke_detectors():
-    detectors = await db.smoke_detectors.find().to_list(1000)
-    return [SmokeDetector(**detector) for detector in detectors]
+@api_router.get("/smoke-detectors", response_model=Union[List[SmokeDetector], SmokeDetectorPage])
+@cached_response("smoke_detectors")
+async def get_smoke_detectors(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None, fields: Optional[str] = None):
+    not_modified = await check_etag(request, response, "smoke_detectors")
+    if not_modified:
+        return not_modified
+    projection = fields_projection(SmokeDetector, fields, "id", "created_at")
+    detectors, next_cursor = await find_page(db.smoke_detectors, {}, "created_at", ASCENDING, limit, after, projection)
+    return list_response(response, SmokeDetector, detectors, next_cursor, paged=limit is not None or after is not None, sparse=projection is not None)
 
 @api_router.get("/smoke-detectors/{detector_id}", response_model=SmokeDetector)
-async def get_smoke_detector(detector_id: str):
-    detector = await db.smoke_detectors.find_one({"id": detector_id})
+async def get_smoke_detector(detector_id: str, request: Request, response: Response):
+    not_modified = await check_etag(request, response, "smoke_detectors")
+    if not_modified:
+        return not_modified
+    detector = await db.smoke_detectors.find_one(by_id(detector_id))
     if not detector:
         raise HTTPException(status_code=404, detail="Smoke detector not found")
     return SmokeDetector(**detector)
 
 @api_router.post("/smoke-detectors/{detector_id}/trigger")
-async def trigger_smoke_detector(detector_id: str):
-    detector = await db.smoke_detectors.find_one({"id": detector_id})
-    if not detector:
-        raise HTTPException(status_code=404, detail="Smoke detector not found")
+async def trigger_smoke_detector(detector_id: str, response: Response):
+    if WRITE_BEHIND_ENABLED:
+        # Unknown ids are only discovered (and logged) when the queue flushes
+        await trigger_queue.enqueue(DetectorEvent(detector_id=detector_id, type=DetectorEventType.TRIGGER))
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "Smoke detector trigger queued"}
     
     # Update detector status
     now = datetime.utcnow()
-    await db.smoke_detectors.update_one(
-        {"id": detector_id},
-        {"$set": {
-            "status": DetectorStatus.TRIGGERED,
-            "last_triggered": now,
-            "updated_at": now
-        }}
-    )
+    detector, updated_detector = await update_and_merge(db.smoke_detectors, by_id(detector_id), {
+        "status": DetectorStatus.TRIGGERED,
+        "last_triggered": now,
+        "updated_at": now
+    })
+    if not detector:
+        raise HTTPException(status_code=404, detail="Smoke detector not found")
     
     # Create alert
+    incident, incident_created = await correlate_incident(detector["location"], "detector_ids", detector_id, now)
     alert = Alert(
         detector_id=detector_id,
         detector_name=detector["name"],
         detector_location=detector["location"],
-        message=f"SMOKE DETECTED at {detector['location']} - {detector['name']}"
+        message=f"SMOKE DETECTED at {detector['location']} - {detector['name']}",
+        timestamp=now,
+        incident_id=incident and incident["id"]
     )
-    await db.alerts.insert_one(alert.dict())
+    alert_doc, created = await raise_alert(alert, "detector_id")
+    await asyncio.gather(
+        bump_counters("detectors", detector["status"], DetectorStatus.TRIGGERED),
+        bump_versions("smoke_detectors", "alerts", *(["incidents"] if incident is not None else []))
+    )
+    publish_change("smoke_detectors", "detector.triggered", detector_id, updated_detector)
+    publish_change("alerts", "alert.created" if created else "alert.coalesced", alert_doc["id"], alert_doc)
+    publish_incident(incident, incident_created)
     
-    return {"message": "Smoke detector triggered successfully", "alert_id": alert.id}
+    return {"message": "Smoke detector triggered successfully", "alert_id": alert_doc["id"], "incident_id": alert_doc.get("incident_id")}
 
 @api_router.post("/smoke-detectors/{detector_id}/reset")
 async def reset_smoke_detector(detector_id: str):
-    detector = await db.smoke_detectors.find_one({"id": detector_id})
+    detector, updated_detector = await update_and_merge(db.smoke_detectors, by_id(detector_id), {
+        "status": DetectorStatus.ACTIVE,
+        "updated_at": datetime.utcnow()
+    })
     if not detector:
         raise HTTPException(status_code=404, detail="Smoke detector not found")
     
-    await db.smoke_detectors.update_one(
-        {"id": detector_id},
-        {"$set": {
-            "status": DetectorStatus.ACTIVE,
-            "updated_at": datetime.utcnow()
-        }}
-    )
+    await bump_counters("detectors", detector["status"], DetectorStatus.ACTIVE)
+    await emit_change("smoke_detectors", "detector.reset", detector_id, updated_detector)
     
     return {"message": "Smoke detector reset successfully"}
 
@@ -334,157 +1605,446 @@ async def reset_smoke_detector(detector_id: str):
 async def create_smoke_detector(detector: SmokeDetectorCreate, admin: str = Depends(get_current_admin)):
     detector_dict = detector.dict()
     detector_obj = SmokeDetector(**detector_dict)
-    await db.smoke_detectors.insert_one(detector_obj.dict())
+    await db.smoke_detectors.insert_one(to_document(detector_obj))
+    await bump_counters("detectors", new_status=detector_obj.status)
+    await emit_change("smoke_detectors", "detector.created", detector_obj.id, detector_obj)
     return detector_obj
 
 @api_router.put("/admin/smoke-detectors/{detector_id}", response_model=SmokeDetector)
 async def update_smoke_detector(detector_id: str, update_data: SmokeDetectorUpdate, admin: str = Depends(get_current_admin)):
-    detector = await db.smoke_detectors.find_one({"id": detector_id})
-    if not detector:
-        raise HTTPException(status_code=404, detail="Smoke detector not found")
-    
     update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
     update_dict["updated_at"] = datetime.utcnow()
     
-    await db.smoke_detectors.update_one(
-        {"id": detector_id},
-        {"$set": update_dict}
-    )
+    detector, updated_detector = await update_and_merge(db.smoke_detectors, by_id(detector_id), update_dict)
+    if not detector:
+        raise HTTPException(status_code=404, detail="Smoke detector not found")
     
-    updated_detector = await db.smoke_detectors.find_one({"id": detector_id})
+    await bump_counters("detectors", detector["status"], updated_detector["status"])
+    await emit_change("smoke_detectors", "detector.updated", detector_id, updated_detector)
     return SmokeDetector(**updated_detector)
 
 @api_router.delete("/admin/smoke-detectors/{detector_id}")
 async def delete_smoke_detector(detector_id: str, admin: str = Depends(get_current_admin)):
-    result = await db.smoke_detectors.delete_one({"id": detector_id})
-    if result.deleted_count == 0:
+    detector = await db.smoke_detectors.find_one_and_delete(by_id(detector_id), projection={"status": 1})
+    if not detector:
         raise HTTPException(status_code=404, detail="Smoke detector not found")
+    await bump_counters("detectors", old_status=detector["status"])
+    await record_deletion("smoke_detectors", detector_id)
+    await emit_change("smoke_detectors", "detector.deleted", detector_id)
     return {"message": "Smoke detector deleted successfully"}
 
+# Detector gateway ingestion
+MAX_INGEST_BATCH = 1000
+
+async def apply_detector_events(events: List[DetectorEvent]) -> List[dict]:
+    """Apply a batch of gateway events with a read and a bulk write per collection.
+
+    Returns one result per event, in order. Several events for the same detector are
+    folded into a single update, and its triggers into a single alert upsert (see
+    raise_alert); with coalescing off every trigger raises its own alert. Triggers are
+    correlated into incidents per zone (see correlate_incidents).
+    """
+    now = datetime.utcnow()
+    detector_keys = [by_id(detector_id)["_id"] for detector_id in {event.detector_id for event in events}]
+    detectors = await db.smoke_detectors.find(
+        {"_id": {"$in": detector_keys}},
+        projection={"_id": 0, "id": 1, "name": 1, "location": 1, "status": 1}
+    ).to_list(None)
+    detectors = {detector["id"]: detector for detector in detectors}
+    
+    results = []
+    # detector id -> fields set on it; the latest trigger and battery reading are kept apart,
+    # since they only apply if newer than the stored ones
+    changes = {}
+    last_triggered = {}
+    batteries = {}
+    alerts = []
+    # detector id -> the alert its triggers in this batch are folded into
+    folded_alerts = {}
+    # alert id -> results of the triggers it stands for
+    alert_results = {}
+    for index, event in enumerate(events):
+        result = {"index": index, "detector_id": event.detector_id}
+        results.append(result)
+        detector = detectors.get(event.detector_id)
+        if detector is None:
+            result["status"] = "not_found"
+            continue
+        if event.type == DetectorEventType.BATTERY and event.battery_level is None:
+            result["status"] = "invalid"
+            result["detail"] = "battery_level is required for battery events"
+            continue
+        
+        fields = changes.setdefault(event.detector_id, {"updated_at": now})
+        if event.type == DetectorEventType.BATTERY:
+            reported_at = event.timestamp or now
+            if event.detector_id not in batteries or reported_at >= batteries[event.detector_id][1]:
+                batteries[event.detector_id] = (event.battery_level, reported_at)
+        else:
+            triggered_at = event.timestamp or now
+            # A write-behind entry can stand for several triggers
+            occurrences = getattr(event, "occurrences", 1)
+            first_triggered = getattr(event, "first_timestamp", None) or triggered_at
+            fields["status"] = DetectorStatus.TRIGGERED
+            last_triggered[event.detector_id] = max(triggered_at, last_triggered.get(event.detector_id, triggered_at))
+            alert = folded_alerts.get(event.detector_id) if ALERT_COALESCE_WINDOW_SECONDS else None
+            if alert is None:
+                alert = Alert(
+                    detector_id=event.detector_id,
+                    detector_name=detector["name"],
+                    detector_location=detector["location"],
+                    message=f"SMOKE DETECTED at {detector['location']} - {detector['name']}",
+                    timestamp=first_triggered,
+                    last_seen=triggered_at,
+                    occurrences=occurrences,
+                    updated_at=now
+                )
+                alerts.append(alert)
+                folded_alerts[event.detector_id] = alert
+            else:
+                alert.occurrences += occurrences
+                alert.timestamp = min(alert.timestamp, first_triggered)
+                alert.last_seen = max(alert.last_seen, triggered_at)
+            alert_results.setdefault(alert.id, []).append(result)
+        result["status"] = "applied"
+    
+    if not changes:
+        return results
+    
+    updates = []
+    for detector_id, fields in changes.items():
+        if detector_id in last_triggered:
+            # A late or retried batch must not move last_triggered back ($max skips a null one)
+            fields = {**fields, "last_triggered": {"$max": ["$last_triggered", last_triggered[detector_id]]}}
+        updates.append(UpdateOne(by_id(detector_id), [{"$set": fields}]))
+    for detector_id, (battery_level, reported_at) in batteries.items():
+        updates.append(UpdateOne(
+            {**by_id(detector_id), "$or": [{"battery_reported_at": None}, {"battery_reported_at": {"$lte": reported_at}}]},
+            {"$set": {"battery_level": battery_level, "battery_reported_at": reported_at}}
+        ))
+    await db.smoke_detectors.bulk_write(updates, ordered=False)
+    # Incidents first, so the alerts can record theirs
+    incidents = await correlate_incidents(alerts, now)
+    # (alert document, created) per alert
+    stored_alerts = []
+    if alerts and not ALERT_COALESCE_WINDOW_SECONDS:
+        await db.alerts.insert_many([to_document(alert) for alert in alerts], ordered=False)
+        stored_alerts = [(alert.dict(), True) for alert in alerts]
+    elif alerts:
+        await db.alerts.bulk_write(
+            [UpdateOne(*coalesce_alert_update(alert, "detector_id"), upsert=True) for alert in alerts],
+            ordered=False
+        )
+        # Every alert the upserts touched carries this batch's updated_at
+        touched = await db.alerts.find(
+            {"detector_id": {"$in": list(folded_alerts)}, "updated_at": now},
+            projection={"_id": 0}
+        ).to_list(None)
+        touched = {doc["detector_id"]: doc for doc in touched}
+        for alert in alerts:
+            alert_doc = touched.get(alert.detector_id, alert.dict())
+            stored_alerts.append((alert_doc, alert_doc["id"] == alert.id))
+    # Statuses come from the read above; a concurrent write can skew the counters until the next reconciliation
+    await asyncio.gather(
+        bump_counters_bulk("detectors", [
+            (detectors[detector_id]["status"], fields.get("status", detectors[detector_id]["status"]))
+            for detector_id, fields in changes.items()
+        ]),
+        bump_versions("smoke_detectors", *(["alerts"] if alerts else []), *(["incidents"] if incidents else []))
+    )
+    
+    if len(changes) > EVENT_BATCH_THRESHOLD:
+        publish_change("smoke_detectors", "detector.bulk_updated", None)
+    else:
+        # Events carry whole documents; the read above only fetched what the batch needed
+        updated_detectors = await db.smoke_detectors.find(
+            {"_id": {"$in": [by_id(detector_id)["_id"] for detector_id in changes]}},
+            projection={"_id": 0}
+        ).to_list(None)
+        for detector in updated_detectors:
+            event_type = "detector.triggered" if "status" in changes[detector["id"]] else "detector.updated"
+            publish_change("smoke_detectors", event_type, detector["id"], detector)
+    if alerts:
+        for alert, (alert_doc, _) in zip(alerts, stored_alerts):
+            for result in alert_results[alert.id]:
+                result["alert_id"] = alert_doc["id"]
+        publish_changes("alerts", "alert.bulk_raised", [
+            ("alert.created" if created else "alert.coalesced", alert_doc["id"], alert_doc)
+            for alert_doc, created in stored_alerts
+        ])
+    if incidents:
+        publish_changes("incidents", "incident.bulk_updated", [
+            ("incident.opened" if created else "incident.updated", incident["id"], incident)
+            for incident, created in incidents
+        ])
+    
+    return results
+
+# Write-behind queue
+# With WRITE_BEHIND_ENABLED, triggers and ingested events are acknowledged as soon as they are
+# queued. Events are coalesced per detector and event type and written through
+# apply_detector_events in batches, so a drill's burst of triggers costs a few bulk writes.
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "5000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.environ.get("WRITE_BEHIND_ENQUEUE_TIMEOUT", "2"))
+
+class WriteBehindQueue:
+    def __init__(self, max_pending: int, batch_size: int, flush_interval: float, enqueue_timeout: float):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        # (detector_id, event type) -> QueuedDetectorEvent; dict order is arrival order
+        self.pending = {}
+        self.flush_requested = asyncio.Event()
+        self.space_available = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.stopping = False
+        self.stats = {"enqueued": 0, "coalesced": 0, "flushed": 0, "rejected": 0, "failed_flushes": 0}
+    
+    def _merge(self, event: QueuedDetectorEvent) -> bool:
+        key = (event.detector_id, event.type)
+        current = self.pending.get(key)
+        if current is None:
+            return False
+        # Keep the latest event's fields, but count every trigger from the first one on
+        latest = event if event.timestamp >= current.timestamp else current
+        self.pending[key] = latest.copy(update={
+            "occurrences": current.occurrences + event.occurrences,
+            "first_timestamp": min(current.first_timestamp, event.first_timestamp),
+        })
+        self.stats["coalesced"] += 1
+        return True
+    
+    async def enqueue(self, event: DetectorEvent):
+        """Queue an event, waiting briefly for space when full; raises 503 if none frees up."""
+        # Stamp arrival time so the delayed write keeps the real trigger time
+        timestamp = event.timestamp or datetime.utcnow()
+        event = QueuedDetectorEvent(**event.dict(exclude={"timestamp"}), timestamp=timestamp, first_timestamp=timestamp)
+        self.stats["enqueued"] += 1
+        while not self._merge(event):
+            if len(self.pending) < self.max_pending:
+                self.pending[(event.detector_id, event.type)] = event
+                break
+            self.space_available.clear()
+            self.flush_requested.set()
+            try:
+                await asyncio.wait_for(self.space_available.wait(), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Ingestion queue is full, retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+        if len(self.pending) >= self.batch_size:
+            self.flush_requested.set()
+    
+    async def flush(self):
+        async with self.flush_lock:
+            while self.pending:
+                keys = list(self.pending)[:self.batch_size]
+                batch = [self.pending.pop(key) for key in keys]
+                self.space_available.set()
+                try:
+                    results = await apply_detector_events(batch)
+                except Exception:
+                    self.stats["failed_flushes"] += 1
+                    logger.exception(f"Write-behind flush of {len(batch)} events failed, requeueing")
+                    for event in batch:
+                        if not self._merge(event) and len(self.pending) < self.max_pending:
+                            self.pending[(event.detector_id, event.type)] = event
+                    # Leave the retry to the next interval
+                    return
+                self.stats["flushed"] += len(batch)
+                rejected = [result for result in results if result["status"] != "applied"]
+                if rejected:
+                    logger.warning(f"Write-behind flush rejected {len(rejected)} events: {rejected[:10]}")
+    
+    async def run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            await self.flush()
+    
+    def stop(self):
+        """Make run() return after one last flush; cancelling it could drop a batch it has taken but not written."""
+        self.stopping = True
+        self.flush_requested.set()
+
+trigger_queue = WriteBehindQueue(
+    WRITE_BEHIND_MAX_PENDING,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_ENQUEUE_TIMEOUT
+)
+
+@api_router.get("/admin/ingest-queue")
+async def get_ingest_queue_stats(admin: str = Depends(get_current_admin)):
+    return {"enabled": WRITE_BEHIND_ENABLED, "pending": len(trigger_queue.pending), **trigger_queue.stats}
+
+@api_router.post("/ingest/detector-events")
+async def ingest_detector_events(events: List[DetectorEvent], response: Response):
+    if len(events) > MAX_INGEST_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_INGEST_BATCH} events per request")
+    if WRITE_BEHIND_ENABLED:
+        for event in events:
+            await trigger_queue.enqueue(event)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"queued": len(events)}
+    results = await apply_detector_events(events)
+    applied = sum(1 for result in results if result["status"] == "applied")
+    return {"applied": applied, "rejected": len(results) - applied, "results": results}
+
 # Public Fire Extinguisher endpoints (read-only)
-@api_router.get("/fire-extinguishers/dispatched")
-async def get_dispatched_extinguishers():
-    extinguishers = await db.fire_extinguishers.find({
-        "dispatch_status": {"$ne": DispatchStatus.NONE}
-    }).to_list(1000)
-    
-    result = []
-    for ext in extinguishers:
-        ext_obj = FireExtinguisher(**ext)
-        result.append(ext_obj)
-    return result
-
-@api_router.get("/fire-extinguishers", response_model=List[FireExtinguisher])
-async def get_fire_extinguishers():
-    extinguishers = await db.fire_extinguishers.find().to_list(1000)
-    result = []
-    for ext in extinguishers:
-        ext_obj = FireExtinguisher(**ext)
-        ext_obj.status = check_extinguisher_status(ext_obj)
-        result.append(ext_obj)
-    return result
+@api_router.get("/fire-extinguishers/dispatched", response_model=Union[List[FireExtinguisher], FireExtinguisherPage])
+async def get_dispatched_extinguishers(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None, fields: Optional[str] = None):
+    not_modified = await check_etag(request, response, "fire_extinguishers")
+    if not_modified:
+        return not_modified
+    projection = fields_projection(FireExtinguisher, fields, "id", "created_at")
+    extinguishers, next_cursor = await find_page(
+        db.fire_extinguishers,
+        {"dispatch_status": {"$ne": DispatchStatus.NONE}},
+        "created_at", ASCENDING, limit, after, projection
+    )
+    return list_response(response, FireExtinguisher, extinguishers, next_cursor, paged=limit is not None or after is not None, sparse=projection is not None)
+
+@api_router.get("/fire-extinguishers/due", response_model=FireExtinguisherPage)
+async def get_due_extinguishers(
+    response: Response,
+    kind: DueKind = DueKind.REFILL,
+    within_days: int = Query(30, ge=0, le=3650),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Extinguishers whose refill or pressure test falls due within the next within_days days, overdue ones first."""
+    due_field = DUE_FIELDS[kind]
+    cutoff = datetime.utcnow() + timedelta(days=within_days)
+    projection = fields_projection(FireExtinguisher, fields, "id", due_field)
+    extinguishers, next_cursor = await find_page(
+        db.fire_extinguishers,
+        {due_field: {"$lte": cutoff}},
+        due_field, ASCENDING, limit, after, projection
+    )
+    return list_response(response, FireExtinguisher, extinguishers, next_cursor, paged=True, sparse=projection is not None)
+
+@api_router.get("/fire-extinguishers", response_model=Union[List[FireExtinguisher], FireExtinguisherPage])
+@cached_response("fire_extinguishers")
+async def get_fire_extinguishers(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None, status: Optional[ExtinguisherStatus] = None, fields: Optional[str] = None):
+    not_modified = await check_etag(request, response, "fire_extinguishers")
+    if not_modified:
+        return not_modified
+    query = {} if status is None else {"status": status}
+    projection = fields_projection(FireExtinguisher, fields, "id", "created_at")
+    extinguishers, next_cursor = await find_page(db.fire_extinguishers, query, "created_at", ASCENDING, limit, after, projection)
+    return list_response(response, FireExtinguisher, extinguishers, next_cursor, paged=limit is not None or after is not None, sparse=projection is not None)
 
 @api_router.get("/fire-extinguishers/{extinguisher_id}", response_model=FireExtinguisher)
-async def get_fire_extinguisher(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
+async def get_fire_extinguisher(extinguisher_id: str, request: Request, response: Response):
+    not_modified = await check_etag(request, response, "fire_extinguishers")
+    if not_modified:
+        return not_modified
+    extinguisher = await db.fire_extinguishers.find_one(by_id(extinguisher_id))
     if not extinguisher:
         raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
-    ext_obj = FireExtinguisher(**extinguisher)
-    ext_obj.status = check_extinguisher_status(ext_obj)
-    return ext_obj
+    return FireExtinguisher(**extinguisher)
 
 # Public Fire Extinguisher action endpoints
 @api_router.post("/fire-extinguishers/{extinguisher_id}/trigger")
 async def trigger_fire_extinguisher(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
-    if not extinguisher:
-        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
-    
     # Update extinguisher status and set refill due to current date
     now = datetime.utcnow()
-    next_refill_due, next_pressure_test_due = calculate_due_dates(now, extinguisher["last_pressure_test"])
-    
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": {
-            "status": ExtinguisherStatus.TRIGGERED,
-            "last_triggered": now,
-            "next_refill_due": now,  # Set refill due to current date
-            "updated_at": now
-        }}
-    )
+    extinguisher, updated_extinguisher = await update_extinguisher(by_id(extinguisher_id), {
+        "status": ExtinguisherStatus.TRIGGERED,
+        "last_triggered": now,
+        "next_refill_due": now,  # Set refill due to current date
+        "updated_at": now
+    })
+    if not extinguisher:
+        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
     # Create alert
+    incident, incident_created = await correlate_incident(extinguisher["location"], "extinguisher_ids", extinguisher_id, now)
     alert = Alert(
         extinguisher_id=extinguisher_id,
         extinguisher_name=extinguisher["name"],
         extinguisher_location=extinguisher["location"],
-        message=f"FIRE EXTINGUISHER USED at {extinguisher['location']} - {extinguisher['name']} - REFILL REQUIRED"
+        message=f"FIRE EXTINGUISHER USED at {extinguisher['location']} - {extinguisher['name']} - REFILL REQUIRED",
+        timestamp=now,
+        incident_id=incident and incident["id"]
     )
-    await db.alerts.insert_one(alert.dict())
+    alert_doc, created = await raise_alert(alert, "extinguisher_id")
+    await asyncio.gather(
+        bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"]),
+        bump_versions("fire_extinguishers", "alerts", *(["incidents"] if incident is not None else []))
+    )
+    publish_change("fire_extinguishers", "extinguisher.triggered", extinguisher_id, extinguisher_view(updated_extinguisher))
+    publish_change("alerts", "alert.created" if created else "alert.coalesced", alert_doc["id"], alert_doc)
+    publish_incident(incident, incident_created)
     
-    return {"message": "Fire extinguisher triggered successfully", "alert_id": alert.id}
+    return {"message": "Fire extinguisher triggered successfully", "alert_id": alert_doc["id"], "incident_id": alert_doc.get("incident_id")}
 
 @api_router.post("/fire-extinguishers/{extinguisher_id}/refill")
 async def refill_fire_extinguisher(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
-    if not extinguisher:
-        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
-    
-    ext_obj = FireExtinguisher(**extinguisher)
-    due_status = is_extinguisher_due(ext_obj)
-    
-    if not due_status["refill_due"]:
-        raise HTTPException(status_code=400, detail="Fire extinguisher is not due for refill")
-    
-    # Update extinguisher with new refill date
+    # Update extinguisher with new refill date, only if it is due (same rule as is_extinguisher_due)
     now = datetime.utcnow()
-    next_refill_due, next_pressure_test_due = calculate_due_dates(now, extinguisher["last_pressure_test"])
-    
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": {
+    extinguisher, updated_extinguisher = await update_extinguisher(
+        {**by_id(extinguisher_id), "$or": [
+            {"status": ExtinguisherStatus.TRIGGERED},
+            {"next_refill_due": {"$lt": now + DUE_WINDOW}},
+        ]},
+        {
             "last_refill": now,
-            "next_refill_due": next_refill_due,
+            "next_refill_due": next_refill_due_from(now),
             "status": ExtinguisherStatus.ACTIVE,
             "updated_at": now
-        }}
+        }
     )
+    if not extinguisher:
+        # Only the failure path pays for telling "not due" from "not found"
+        if await db.fire_extinguishers.find_one(by_id(extinguisher_id), projection={"_id": 1}):
+            raise HTTPException(status_code=400, detail="Fire extinguisher is not due for refill")
+        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
+    
+    await bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"])
+    await emit_change("fire_extinguishers", "extinguisher.refilled", extinguisher_id, extinguisher_view(updated_extinguisher))
     
     return {"message": "Fire extinguisher refilled successfully"}
 
 @api_router.post("/fire-extinguishers/{extinguisher_id}/pressure-test")
 async def pressure_test_fire_extinguisher(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
-    if not extinguisher:
-        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
-    
-    ext_obj = FireExtinguisher(**extinguisher)
-    due_status = is_extinguisher_due(ext_obj)
-    
-    if not due_status["pressure_test_due"]:
-        raise HTTPException(status_code=400, detail="Fire extinguisher is not due for pressure test")
-    
-    # Update extinguisher with new pressure test date
+    # Update extinguisher with new pressure test date, only if it is due
     now = datetime.utcnow()
-    next_refill_due, next_pressure_test_due = calculate_due_dates(extinguisher["last_refill"], now)
-    
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": {
+    extinguisher, updated_extinguisher = await update_extinguisher(
+        {**by_id(extinguisher_id), "next_pressure_test_due": {"$lt": now + DUE_WINDOW}},
+        {
             "last_pressure_test": now,
-            "next_pressure_test_due": next_pressure_test_due,
+            "next_pressure_test_due": next_pressure_test_due_from(now),
             "status": ExtinguisherStatus.ACTIVE,
             "updated_at": now
-        }}
+        }
     )
+    if not extinguisher:
+        if await db.fire_extinguishers.find_one(by_id(extinguisher_id), projection={"_id": 1}):
+            raise HTTPException(status_code=400, detail="Fire extinguisher is not due for pressure test")
+        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
+    
+    await bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"])
+    await emit_change("fire_extinguishers", "extinguisher.pressure_tested", extinguisher_id, extinguisher_view(updated_extinguisher))
     
     return {"message": "Fire extinguisher pressure test completed successfully"}
 
 @api_router.get("/fire-extinguishers/{extinguisher_id}/due-status")
 async def get_extinguisher_due_status(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
+    extinguisher = await db.fire_extinguishers.find_one(by_id(extinguisher_id))
     if not extinguisher:
         raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
@@ -508,267 +2068,690 @@ async def create_fire_extinguisher(extinguisher: FireExtinguisherCreate, admin:
         next_pressure_test_due=next_pressure_test_due
     )
     
-    # Check status
-    extinguisher_obj.status = check_extinguisher_status(extinguisher_obj)
+    # Materialize status and days_until_*
+    extinguisher_obj = FireExtinguisher(**{**extinguisher_obj.dict(), **extinguisher_due_fields(extinguisher_obj)})
     
-    await db.fire_extinguishers.insert_one(extinguisher_obj.dict())
+    await db.fire_extinguishers.insert_one(to_document(extinguisher_obj))
+    await bump_counters("extinguishers", new_status=extinguisher_obj.status)
+    await emit_change("fire_extinguishers", "extinguisher.created", extinguisher_obj.id, extinguisher_obj)
     return extinguisher_obj
 
 @api_router.put("/admin/fire-extinguishers/{extinguisher_id}", response_model=FireExtinguisher)
 async def update_fire_extinguisher(extinguisher_id: str, update_data: FireExtinguisherUpdate, admin: str = Depends(get_current_admin)):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
-    if not extinguisher:
-        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
-    
     update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
     update_dict["updated_at"] = datetime.utcnow()
     
     # Recalculate due dates if refill or pressure test dates are updated
-    if "last_refill" in update_dict or "last_pressure_test" in update_dict:
-        last_refill = update_dict.get("last_refill", extinguisher["last_refill"])
-        last_pressure_test = update_dict.get("last_pressure_test", extinguisher["last_pressure_test"])
-        next_refill_due, next_pressure_test_due = calculate_due_dates(last_refill, last_pressure_test)
-        update_dict["next_refill_due"] = next_refill_due
-        update_dict["next_pressure_test_due"] = next_pressure_test_due
+    if "last_refill" in update_dict:
+        update_dict["next_refill_due"] = next_refill_due_from(update_dict["last_refill"])
+    if "last_pressure_test" in update_dict:
+        update_dict["next_pressure_test_due"] = next_pressure_test_due_from(update_dict["last_pressure_test"])
     
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": update_dict}
-    )
+    extinguisher, updated_extinguisher = await update_extinguisher(by_id(extinguisher_id), update_dict)
+    if not extinguisher:
+        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
-    updated_extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
-    ext_obj = FireExtinguisher(**updated_extinguisher)
-    ext_obj.status = check_extinguisher_status(ext_obj)
+    await bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"])
+    ext_obj = extinguisher_view(updated_extinguisher)
+    await emit_change("fire_extinguishers", "extinguisher.updated", extinguisher_id, ext_obj)
     return ext_obj
 
 @api_router.delete("/admin/fire-extinguishers/{extinguisher_id}")
 async def delete_fire_extinguisher(extinguisher_id: str, admin: str = Depends(get_current_admin)):
-    result = await db.fire_extinguishers.delete_one({"id": extinguisher_id})
-    if result.deleted_count == 0:
+    extinguisher = await db.fire_extinguishers.find_one_and_delete(by_id(extinguisher_id), projection={"status": 1})
+    if not extinguisher:
         raise HTTPException(status_code=404, detail="Fire extinguisher not found")
+    await bump_counters("extinguishers", old_status=extinguisher["status"])
+    await record_deletion("fire_extinguishers", extinguisher_id)
+    await emit_change("fire_extinguishers", "extinguisher.deleted", extinguisher_id)
     return {"message": "Fire extinguisher deleted successfully"}
 
 # Maintenance Items endpoints
-@api_router.get("/maintenance-items", response_model=List[MaintenanceItem])
-async def get_maintenance_items():
-    items = await db.maintenance_items.find().sort("created_at", -1).to_list(1000)
-    result = []
-    for item in items:
-        item_obj = MaintenanceItem(**item)
-        item_obj.status = check_maintenance_item_status(item_obj)
-        result.append(item_obj)
-    return result
+@api_router.get("/maintenance-items", response_model=Union[List[MaintenanceItem], MaintenanceItemPage])
+@cached_response("maintenance_items")
+async def get_maintenance_items(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), after: Optional[str] = None, status: Optional[MaintenanceItemStatus] = None, fields: Optional[str] = None):
+    not_modified = await check_etag(request, response, "maintenance_items")
+    if not_modified:
+        return not_modified
+    query = {} if status is None else {"status": status}
+    projection = fields_projection(MaintenanceItem, fields, "id", "created_at")
+    items, next_cursor = await find_page(db.maintenance_items, query, "created_at", DESCENDING, limit, after, projection)
+    return list_response(response, MaintenanceItem, items, next_cursor, paged=limit is not None or after is not None, sparse=projection is not None)
 
 @api_router.get("/maintenance-items/{item_id}", response_model=MaintenanceItem)
-async def get_maintenance_item(item_id: str):
-    item = await db.maintenance_items.find_one({"id": item_id})
+async def get_maintenance_item(item_id: str, request: Request, response: Response):
+    not_modified = await check_etag(request, response, "maintenance_items")
+    if not_modified:
+        return not_modified
+    item = await db.maintenance_items.find_one(by_id(item_id))
     if not item:
         raise HTTPException(status_code=404, detail="Maintenance item not found")
     
-    item_obj = MaintenanceItem(**item)
-    item_obj.status = check_maintenance_item_status(item_obj)
-    return item_obj
+    return MaintenanceItem(**item)
 
 @api_router.post("/maintenance-items", response_model=MaintenanceItem)
 async def create_maintenance_item(item: MaintenanceItemCreate):
     item_dict = item.dict()
     item_obj = MaintenanceItem(**item_dict)
     item_obj.status = check_maintenance_item_status(item_obj)
-    await db.maintenance_items.insert_one(item_obj.dict())
+    await db.maintenance_items.insert_one(to_document(item_obj))
+    await bump_counters("maintenance", new_status=item_obj.status)
+    await emit_change("maintenance_items", "maintenance_item.created", item_obj.id, item_obj)
     return item_obj
 
 @api_router.put("/maintenance-items/{item_id}", response_model=MaintenanceItem)
 async def update_maintenance_item(item_id: str, update_data: MaintenanceItemUpdate):
-    item = await db.maintenance_items.find_one({"id": item_id})
-    if not item:
-        raise HTTPException(status_code=404, detail="Maintenance item not found")
-    
     update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
     update_dict["updated_at"] = datetime.utcnow()
     
-    await db.maintenance_items.update_one(
-        {"id": item_id},
-        {"$set": update_dict}
-    )
+    item, updated_item = await update_maintenance(by_id(item_id), update_dict)
+    if not item:
+        raise HTTPException(status_code=404, detail="Maintenance item not found")
     
-    updated_item = await db.maintenance_items.find_one({"id": item_id})
-    item_obj = MaintenanceItem(**updated_item)
-    item_obj.status = check_maintenance_item_status(item_obj)
+    await bump_counters("maintenance", item["status"], updated_item["status"])
+    item_obj = maintenance_item_view(updated_item)
+    await emit_change("maintenance_items", "maintenance_item.updated", item_id, item_obj)
     return item_obj
 
 @api_router.delete("/maintenance-items/{item_id}")
 async def delete_maintenance_item(item_id: str):
-    result = await db.maintenance_items.delete_one({"id": item_id})
-    if result.deleted_count == 0:
+    item = await db.maintenance_items.find_one_and_delete(by_id(item_id), projection={"status": 1})
+    if not item:
         raise HTTPException(status_code=404, detail="Maintenance item not found")
+    notes = await db.maintenance_notes.delete_many({"item_id": item_id})
+    await asyncio.gather(
+        bump_counters("maintenance", old_status=item["status"]),
+        record_deletion("maintenance_items", item_id),
+        bump_versions("maintenance_items", *(["maintenance_notes"] if notes.deleted_count else []))
+    )
+    publish_change("maintenance_items", "maintenance_item.deleted", item_id)
     return {"message": "Maintenance item deleted successfully"}
 
+@api_router.get("/maintenance-items/{item_id}/notes", response_model=MaintenanceNotePage)
+async def get_maintenance_notes(
+    item_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    """Notes of an item, oldest first."""
+    not_modified = await check_etag(request, response, "maintenance_notes")
+    if not_modified:
+        return not_modified
+    notes, next_cursor = await find_page(db.maintenance_notes, {"item_id": item_id}, "created_at", ASCENDING, limit, after)
+    # Only an empty first page needs telling "no notes" from "no item"
+    if not notes and not after and not await db.maintenance_items.find_one(by_id(item_id), projection={"_id": 1}):
+        raise HTTPException(status_code=404, detail="Maintenance item not found")
+    return list_response(response, MaintenanceNote, notes, next_cursor, paged=True)
+
 @api_router.post("/maintenance-items/{item_id}/notes", response_model=MaintenanceItem)
 async def add_maintenance_note(item_id: str, note_data: MaintenanceNoteCreate):
-    item = await db.maintenance_items.find_one({"id": item_id})
-    if not item:
-        raise HTTPException(status_code=404, detail="Maintenance item not found")
+    new_note = MaintenanceNote(item_id=item_id, note=note_data.note, created_by="user")
     
-    new_note = MaintenanceNote(note=note_data.note, created_by="user")
-    
-    await db.maintenance_items.update_one(
-        {"id": item_id},
+    # Insert first so note_count never counts a note that is not there
+    await db.maintenance_notes.insert_one(to_document(new_note))
+    updated_item = await db.maintenance_items.find_one_and_update(
+        by_id(item_id),
         {
-            "$push": {"notes": new_note.dict()},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
+            "$inc": {"note_count": 1},
+            "$set": {"latest_note": new_note.dict(), "updated_at": datetime.utcnow()}
+        },
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_item:
+        await db.maintenance_notes.delete_one(by_id(new_note.id))
+        raise HTTPException(status_code=404, detail="Maintenance item not found")
     
-    updated_item = await db.maintenance_items.find_one({"id": item_id})
-    item_obj = MaintenanceItem(**updated_item)
-    item_obj.status = check_maintenance_item_status(item_obj)
+    await bump_versions("maintenance_notes", "maintenance_items")
+    item_obj = maintenance_item_view(updated_item)
+    publish_change("maintenance_items", "maintenance_item.note_added", item_id, item_obj)
     return item_obj
 
 # Alert endpoints
-@api_router.get("/alerts", response_model=List[Alert])
-async def get_alerts():
-    alerts = await db.alerts.find().sort("timestamp", -1).to_list(1000)
-    return [Alert(**alert) for alert in alerts]
+def alert_query(
+    acknowledged: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    detector_id: Optional[str] = None,
+    extinguisher_id: Optional[str] = None,
+    incident_id: Optional[str] = None
+) -> dict:
+    """Filter for the alert list endpoints; since is inclusive, until exclusive."""
+    query = {}
+    if incident_id is not None:
+        query["incident_id"] = incident_id
+    if acknowledged is not None:
+        query["acknowledged"] = acknowledged
+    if detector_id is not None:
+        query["detector_id"] = detector_id
+    if extinguisher_id is not None:
+        query["extinguisher_id"] = extinguisher_id
+    if since is not None:
+        query.setdefault("timestamp", {})["$gte"] = naive_utc(since)
+    if until is not None:
+        query.setdefault("timestamp", {})["$lt"] = naive_utc(until)
+    return query
+
+@api_router.get("/alerts", response_model=Union[List[Alert], AlertPage])
+@cached_response("alerts")
+async def get_alerts(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    query: dict = Depends(alert_query)
+):
+    not_modified = await check_etag(request, response, "alerts")
+    if not_modified:
+        return not_modified
+    projection = fields_projection(Alert, fields, "id", "timestamp")
+    alerts, next_cursor = await find_page(db.alerts, query, "timestamp", DESCENDING, limit, after, projection)
+    return list_response(response, Alert, alerts, next_cursor, paged=limit is not None or after is not None, sparse=projection is not None)
 
 @api_router.put("/alerts/{alert_id}/acknowledge")
 async def acknowledge_alert(alert_id: str):
-    result = await db.alerts.update_one(
-        {"id": alert_id},
-        {"$set": {"acknowledged": True}}
+    alert = await db.alerts.find_one_and_update(
+        by_id(alert_id),
+        {"$set": {"acknowledged": True, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
     )
-    if result.matched_count == 0:
+    if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await emit_change("alerts", "alert.acknowledged", alert_id, alert)
     return {"message": "Alert acknowledged"}
 
 @api_router.delete("/alerts/{alert_id}")
 async def delete_alert(alert_id: str):
-    result = await db.alerts.delete_one({"id": alert_id})
+    result = await db.alerts.delete_one(by_id(alert_id))
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await record_deletion("alerts", alert_id)
+    await emit_change("alerts", "alert.deleted", alert_id)
     return {"message": "Alert deleted successfully"}
 
-# Dashboard endpoint
-@api_router.get("/dashboard")
-async def get_dashboard():
-    # Get detector stats
-    total_detectors = await db.smoke_detectors.count_documents({})
-    active_detectors = await db.smoke_detectors.count_documents({"status": "active"})
-    triggered_detectors = await db.smoke_detectors.count_documents({"status": "triggered"})
+# Bulk alert actions
+# One update_many for a whole selection, e.g. clearing the alerts of a drill; deletes go in
+# batches of ALERT_DELETE_BATCH_SIZE. Clients get a single event without an id and reload their alert list.
+MAX_BULK_IDS = 1000
+ALERT_DELETE_BATCH_SIZE = int(os.environ.get("ALERT_DELETE_BATCH_SIZE", "500"))
+
+def alert_selection_query(selection: AlertSelection) -> dict:
+    query = alert_query(
+        since=selection.since,
+        until=selection.until,
+        detector_id=selection.detector_id,
+        extinguisher_id=selection.extinguisher_id
+    )
+    if selection.ids is not None:
+        if len(selection.ids) > MAX_BULK_IDS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_IDS} ids per request")
+        query["_id"] = {"$in": [by_id(alert_id)["_id"] for alert_id in selection.ids]}
+    if not query:
+        # An empty selection would match every alert; ask for that explicitly with a filter
+        raise HTTPException(status_code=400, detail="Give ids or at least one filter")
+    return query
+
+@api_router.post("/alerts/acknowledge")
+async def acknowledge_alerts(selection: AlertSelection):
+    query = alert_selection_query(selection)
+    result = await db.alerts.update_many(
+        {**query, "acknowledged": False},
+        {"$set": {"acknowledged": True, "updated_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        await emit_change("alerts", "alert.bulk_acknowledged", None)
+    return {"message": "Alerts acknowledged", "acknowledged": result.modified_count}
+
+@api_router.post("/alerts/delete")
+async def delete_alerts(selection: AlertSelection):
+    query = alert_selection_query(selection)
+    deleted = 0
+    while True:
+        # Read the ids first: they are needed for the tombstones, and deleting exactly these
+        # keeps an alert created meanwhile from disappearing without one
+        batch = await db.alerts.find(query, {"_id": 1, "id": 1}).limit(ALERT_DELETE_BATCH_SIZE).to_list(ALERT_DELETE_BATCH_SIZE)
+        if not batch:
+            break
+        result = await db.alerts.delete_many({"_id": {"$in": [alert["_id"] for alert in batch]}})
+        await record_deletions("alerts", [alert["id"] for alert in batch])
+        deleted += result.deleted_count
+        if len(batch) < ALERT_DELETE_BATCH_SIZE:
+            break
+    if deleted:
+        await emit_change("alerts", "alert.bulk_deleted", None)
+    return {"message": "Alerts deleted", "deleted": deleted}
+
+# Incident endpoints
+@api_router.get("/incidents", response_model=Union[List[Incident], IncidentPage])
+@cached_response("incidents")
+async def get_incidents(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    acknowledged: Optional[bool] = None
+):
+    not_modified = await check_etag(request, response, "incidents")
+    if not_modified:
+        return not_modified
+    query = {} if acknowledged is None else {"acknowledged": acknowledged}
+    incidents, next_cursor = await find_page(db.incidents, query, "started_at", DESCENDING, limit, after)
+    return list_response(response, Incident, incidents, next_cursor, paged=limit is not None or after is not None)
+
+@api_router.get("/incidents/{incident_id}", response_model=Incident)
+async def get_incident(incident_id: str, request: Request, response: Response):
+    not_modified = await check_etag(request, response, "incidents")
+    if not_modified:
+        return not_modified
+    incident = await db.incidents.find_one(by_id(incident_id))
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return Incident(**incident)
+
+@api_router.put("/incidents/{incident_id}/acknowledge")
+async def acknowledge_incident(incident_id: str):
+    """Acknowledge an incident together with all of its alerts."""
+    now = datetime.utcnow()
+    incident = await db.incidents.find_one_and_update(
+        by_id(incident_id),
+        {"$set": {"acknowledged": True, "updated_at": now}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    result = await db.alerts.update_many(
+        {"incident_id": incident_id, "acknowledged": False},
+        {"$set": {"acknowledged": True, "updated_at": now}}
+    )
+    await bump_versions("incidents", *(["alerts"] if result.modified_count else []))
+    publish_change("incidents", "incident.acknowledged", incident_id, incident)
+    if result.modified_count:
+        publish_change("alerts", "alert.bulk_acknowledged", None)
+    return {"message": "Incident acknowledged", "alerts_acknowledged": result.modified_count}
+
+# Alert retention
+# Acknowledged alerts older than ALERT_RETENTION_DAYS are moved to alerts_archive in batches, so
+# the alerts collection, and every poll of it, only holds what is still relevant. Clients see an
+# archived alert as deleted (event and tombstone); /admin/alerts/archive reads the archive.
+ALERT_RETENTION_DAYS = int(os.environ.get("ALERT_RETENTION_DAYS", "30"))
+ALERT_ARCHIVE_INTERVAL = int(os.environ.get("ALERT_ARCHIVE_INTERVAL", "3600"))
+ALERT_ARCHIVE_BATCH_SIZE = int(os.environ.get("ALERT_ARCHIVE_BATCH_SIZE", "500"))
+
+async def archive_acknowledged_alerts() -> int:
+    """Move acknowledged alerts past the retention age to alerts_archive; returns how many were moved."""
+    cutoff = datetime.utcnow() - timedelta(days=ALERT_RETENTION_DAYS)
+    query = {"acknowledged": True, "timestamp": {"$lt": cutoff}}
+    archived = 0
+    while True:
+        batch = await db.alerts.find(query).sort("timestamp", ASCENDING).limit(ALERT_ARCHIVE_BATCH_SIZE).to_list(ALERT_ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        # Upserts, so a batch copied by a run that stopped before deleting is not archived twice
+        await db.alerts_archive.bulk_write(
+            [
+                UpdateOne({"_id": alert["_id"]}, {"$setOnInsert": {k: v for k, v in alert.items() if k != "_id"}}, upsert=True)
+                for alert in batch
+            ],
+            ordered=False
+        )
+        result = await db.alerts.delete_many({"_id": {"$in": [alert["_id"] for alert in batch]}})
+        await record_deletions("alerts", [alert["id"] for alert in batch])
+        await bump_version("alerts")
+        # One event per batch; an event per alert would overflow the streams (see EVENT_BATCH_THRESHOLD)
+        publish_change("alerts", "alert.archived", None)
+        archived += result.deleted_count
+        if len(batch) < ALERT_ARCHIVE_BATCH_SIZE:
+            break
+    if archived:
+        logger.info(f"Archived {archived} acknowledged alerts older than {ALERT_RETENTION_DAYS} days")
+    return archived
+
+@api_router.post("/admin/alerts/archive")
+async def run_alert_archive(admin: str = Depends(get_current_admin)):
+    archived = await archive_acknowledged_alerts()
+    return {"message": "Alerts archived", "archived": archived}
+
+@api_router.get("/admin/alerts/archive", response_model=AlertPage)
+async def get_archived_alerts(
+    admin: str = Depends(get_current_admin),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    query: dict = Depends(alert_query)
+):
+    alerts, next_cursor = await find_page(db.alerts_archive, query, "timestamp", DESCENDING, limit, after)
+    return AlertPage(items=[Alert(**alert) for alert in alerts], next_cursor=next_cursor)
+
+# Delta sync endpoint
+SYNC_VIEWS = {
+    "smoke_detectors": lambda doc: SmokeDetector(**doc),
+    "fire_extinguishers": extinguisher_view,
+    "maintenance_items": maintenance_item_view,
+    "alerts": lambda doc: Alert(**doc),
+    "incidents": lambda doc: Incident(**doc),
+}
+
+# Tombstones are paged under this name, next to the collections
+SYNC_DELETED = "deleted"
+
+async def sync_page(name: str, since: Optional[datetime], limit: int, after: Optional[str]):
+    """One page of a collection's changes, or of the tombstones, since the watermark."""
+    if name == SYNC_DELETED:
+        if since is None:
+            # A full snapshot has nothing to delete client-side
+            return [], None
+        return await find_page(db.tombstones, {"deleted_at": {"$gte": since}}, "deleted_at", ASCENDING, limit, after)
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    return await find_page(db[name], query, "updated_at", ASCENDING, limit, after)
+
+@api_router.get("/sync")
+async def sync_changes(
+    since: Optional[datetime] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    collection: Optional[str] = None,
+    after: Optional[str] = None
+):
+    """Documents changed and ids deleted since the given watermark, a page per collection.
+
+    Omit since for a full snapshot; pass back the returned watermark on the next call.
+    Each collection, and the deletions ("deleted"), is paged on its own: while next_cursors
+    has a cursor for one, fetch the rest with the same since, collection=<name> and
+    after=<cursor>, and keep the watermark of the first call. Documents may be delivered
+    more than once around a watermark, so apply them idempotently.
+    """
+    now = datetime.utcnow()
+    if since is not None:
+        since = naive_utc(since)
+    if since is not None and since < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise HTTPException(status_code=410, detail="since is older than the tombstone retention period, reload everything")
+    names = [*SYNC_VIEWS, SYNC_DELETED]
+    if collection is not None and collection not in names:
+        raise HTTPException(status_code=400, detail=f"collection must be one of {', '.join(names)}")
+    if after is not None and collection is None:
+        raise HTTPException(status_code=400, detail="after continues a single collection; give collection too")
     
-    # Get extinguisher stats
-    total_extinguishers = await db.fire_extinguishers.count_documents({})
-    triggered_extinguishers = await db.fire_extinguishers.count_documents({"status": "triggered"})
+    if collection is not None:
+        names = [collection]
+    pages = dict(zip(names, await asyncio.gather(*(sync_page(name, since, limit, after) for name in names))))
     
-    # Get maintenance stats
-    total_maintenance = await db.maintenance_items.count_documents({})
-    pending_maintenance = await db.maintenance_items.count_documents({"status": "pending"})
-    overdue_maintenance = await db.maintenance_items.count_documents({"status": "overdue"})
+    deleted = {}
+    if SYNC_DELETED in pages:
+        deleted = {name: [] for name in SYNC_VIEWS}
+        for tombstone in pages[SYNC_DELETED][0]:
+            deleted.setdefault(tombstone["collection"], []).append(tombstone["id"])
+    
+    body = {
+        "changed": {
+            name: [view(doc) for doc in pages[name][0]]
+            for name, view in SYNC_VIEWS.items() if name in pages
+        },
+        "deleted": deleted,
+        "next_cursors": {name: next_cursor for name, (_, next_cursor) in pages.items()},
+    }
+    if collection is None:
+        body["watermark"] = now - timedelta(seconds=SYNC_GRACE_SECONDS)
+    return body
+
+# Dashboard endpoint
+async def count_by_status(collection) -> dict:
+    """Count documents per status in a single $group pass; "total" holds the overall count."""
+    rows = await collection.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    counts = {row["_id"]: row["count"] for row in rows if row["_id"] is not None}
+    counts["total"] = sum(row["count"] for row in rows)
+    return counts
+
+# Dashboard counters
+# A single document of per-status counts, kept current with $inc by every write path
+# and periodically recomputed from scratch to correct drift.
+DASHBOARD_COUNTERS_ID = "dashboard"
+COUNTER_SECTIONS = {
+    "detectors": "smoke_detectors",
+    "extinguishers": "fire_extinguishers",
+    "maintenance": "maintenance_items",
+}
+COUNTER_RECONCILE_INTERVAL = int(os.environ.get("COUNTER_RECONCILE_INTERVAL", "300"))
+
+async def bump_counters(section: str, old_status=None, new_status=None):
+    """Move one document between status buckets; omit old_status for inserts and new_status for deletes."""
+    await bump_counters_bulk(section, [(old_status, new_status)])
+
+async def bump_counters_bulk(section: str, transitions):
+    """Apply many (old_status, new_status) moves with a single $inc."""
+    inc = {}
+    for old_status, new_status in transitions:
+        old_status = getattr(old_status, "value", old_status)
+        new_status = getattr(new_status, "value", new_status)
+        if old_status == new_status:
+            continue
+        if old_status is None:
+            inc[f"{section}.total"] = inc.get(f"{section}.total", 0) + 1
+        else:
+            inc[f"{section}.{old_status}"] = inc.get(f"{section}.{old_status}", 0) - 1
+        if new_status is None:
+            inc[f"{section}.total"] = inc.get(f"{section}.total", 0) - 1
+        else:
+            inc[f"{section}.{new_status}"] = inc.get(f"{section}.{new_status}", 0) + 1
+    inc = {key: amount for key, amount in inc.items() if amount}
+    if inc:
+        await db.dashboard_counters.update_one({"_id": DASHBOARD_COUNTERS_ID}, {"$inc": inc}, upsert=True)
+
+async def compute_dashboard_counters() -> dict:
+    counts = await asyncio.gather(*(count_by_status(db[name]) for name in COUNTER_SECTIONS.values()))
+    return dict(zip(COUNTER_SECTIONS, counts))
+
+async def reconcile_dashboard_counters() -> dict:
+    """Recompute the counters from the collections, store them, and return the drift that was corrected."""
+    actual, stored = await asyncio.gather(
+        compute_dashboard_counters(),
+        db.dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID}),
+    )
+    stored = stored or {}
+    drift = {}
+    for section, counts in actual.items():
+        stored_counts = stored.get(section, {})
+        for key in set(counts) | set(stored_counts):
+            difference = stored_counts.get(key, 0) - counts.get(key, 0)
+            if difference:
+                drift[f"{section}.{key}"] = difference
     
-    # Get recent alerts
-    recent_alerts = await db.alerts.find({"acknowledged": False}).sort("timestamp", -1).limit(10).to_list(10)
+    # Writes landing between the recount and this replace are lost until the next run
+    await db.dashboard_counters.replace_one(
+        {"_id": DASHBOARD_COUNTERS_ID},
+        {**actual, "reconciled_at": datetime.utcnow()},
+        upsert=True
+    )
+    if drift:
+        logger.warning(f"Dashboard counters drifted, corrected: {drift}")
+        await bump_version("dashboard_counters")
+    return drift
+
+async def run_periodically(interval: int, job):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logger.exception(f"Background job {job.__name__} failed")
+
+@api_router.get("/admin/single-flight")
+async def get_single_flight_stats(admin: str = Depends(get_current_admin)):
+    return read_flight.info()
+
+@api_router.get("/admin/response-cache")
+async def get_response_cache_stats(admin: str = Depends(get_current_admin)):
+    return await cache_backend.info()
+
+@api_router.post("/admin/dashboard-counters/reconcile")
+async def reconcile_dashboard(admin: str = Depends(get_current_admin)):
+    drift = await reconcile_dashboard_counters()
+    return {"message": "Dashboard counters reconciled", "drift": drift}
+
+# Everything the dashboard is computed from
+DASHBOARD_SOURCES = (*COUNTER_SECTIONS.values(), "alerts", "incidents", "dashboard_counters")
+
+@api_router.get("/dashboard")
+@cached_response(*DASHBOARD_SOURCES)
+async def get_dashboard(request: Request, response: Response):
+    not_modified = await check_etag(request, response, *DASHBOARD_SOURCES)
+    if not_modified:
+        return not_modified
+    return await read_flight.do(("dashboard",), DASHBOARD_SOURCES, load_dashboard)
+
+async def load_dashboard() -> dict:
+    counters, recent_alerts, open_incidents = await asyncio.gather(
+        db.dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID}),
+        db.alerts.find({"acknowledged": False}).sort("timestamp", -1).limit(10).to_list(10),
+        db.incidents.find({"acknowledged": False}).sort("last_seen", -1).limit(10).to_list(10),
+    )
+    if counters is None:
+        # Not reconciled yet (fresh database); fall back to counting
+        counters = await compute_dashboard_counters()
+    detector_counts = counters.get("detectors", {})
+    extinguisher_counts = counters.get("extinguishers", {})
+    maintenance_counts = counters.get("maintenance", {})
     
     return {
         "detectors": {
-            "total": total_detectors,
-            "active": active_detectors,
-            "triggered": triggered_detectors
+            "total": detector_counts.get("total", 0),
+            "active": detector_counts.get("active", 0),
+            "triggered": detector_counts.get("triggered", 0)
         },
         "extinguishers": {
-            "total": total_extinguishers,
-            "triggered": triggered_extinguishers
+            "total": extinguisher_counts.get("total", 0),
+            "triggered": extinguisher_counts.get("triggered", 0)
         },
         "maintenance": {
-            "total": total_maintenance,
-            "pending": pending_maintenance,
-            "overdue": overdue_maintenance
+            "total": maintenance_counts.get("total", 0),
+            "pending": maintenance_counts.get("pending", 0),
+            "overdue": maintenance_counts.get("overdue", 0)
         },
-        "recent_alerts": [Alert(**alert) for alert in recent_alerts]
+        "recent_alerts": [Alert(**alert) for alert in recent_alerts],
+        "open_incidents": [Incident(**incident) for incident in open_incidents]
     }
 
+# Snapshot endpoint
+# Only the newest alerts; older ones are paged in through /alerts with the returned cursor
+SNAPSHOT_ALERT_LIMIT = int(os.environ.get("SNAPSHOT_ALERT_LIMIT", "100"))
+
+@api_router.get("/snapshot")
+@cached_response(*SYNC_VIEWS, "dashboard_counters")
+async def get_snapshot(request: Request, response: Response):
+    """Everything the dashboard UI shows, in one response.
+
+    Lists are capped (see find_page); next_cursors holds, per list, the cursor of what was left out.
+    """
+    not_modified = await check_etag(request, response, *SYNC_VIEWS, "dashboard_counters")
+    if not_modified:
+        return not_modified
+    
+    (detectors, detectors_cursor), (extinguishers, extinguishers_cursor), (items, items_cursor), (alerts, alerts_cursor), dashboard = await asyncio.gather(
+        find_page(db.smoke_detectors, {}, "created_at", ASCENDING, None, None),
+        find_page(db.fire_extinguishers, {}, "created_at", ASCENDING, None, None),
+        find_page(db.maintenance_items, {}, "created_at", DESCENDING, None, None),
+        find_page(db.alerts, {}, "timestamp", DESCENDING, SNAPSHOT_ALERT_LIMIT, None),
+        load_dashboard(),
+    )
+    extinguisher_items = serialize_docs(FireExtinguisher, extinguishers)
+    if extinguishers_cursor is None:
+        # Derived from the full list instead of a second query
+        dispatched_items = [
+            item for item, ext in zip(extinguisher_items, extinguishers)
+            if ext.get("dispatch_status", DispatchStatus.NONE) != DispatchStatus.NONE
+        ]
+        dispatched_cursor = None
+    else:
+        dispatched, dispatched_cursor = await find_page(
+            db.fire_extinguishers, {"dispatch_status": {"$ne": DispatchStatus.NONE}}, "created_at", ASCENDING, None, None
+        )
+        dispatched_items = serialize_docs(FireExtinguisher, dispatched)
+    
+    content = {
+        "smoke_detectors": serialize_docs(SmokeDetector, detectors),
+        "fire_extinguishers": extinguisher_items,
+        "dispatched_extinguishers": dispatched_items,
+        "maintenance_items": serialize_docs(MaintenanceItem, items),
+        "alerts": serialize_docs(Alert, alerts),
+        "dashboard": dashboard,
+        "next_cursors": {
+            "smoke_detectors": detectors_cursor,
+            "fire_extinguishers": extinguishers_cursor,
+            "dispatched_extinguishers": dispatched_cursor,
+            "maintenance_items": items_cursor,
+            "alerts": alerts_cursor,
+        },
+    }
+    if not FAST_SERIALIZATION:
+        return content
+    content["dashboard"] = jsonable_encoder(dashboard)
+    return json_response(response, content)
+
 # Dispatch endpoints
 @api_router.post("/fire-extinguishers/{extinguisher_id}/dispatch")
 async def dispatch_extinguisher(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
+    # Update extinguisher dispatch status
+    now = datetime.utcnow()
+    extinguisher, updated_extinguisher = await update_extinguisher(by_id(extinguisher_id), {
+        "dispatch_status": DispatchStatus.DISPATCHED,
+        "dispatch_date": now,
+        "updated_at": now
+    })
     if not extinguisher:
         raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
-    # Update extinguisher dispatch status
-    now = datetime.utcnow()
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": {
-            "dispatch_status": DispatchStatus.DISPATCHED,
-            "dispatch_date": now,
-            "updated_at": now
-        }}
-    )
+    await bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"])
+    await emit_change("fire_extinguishers", "extinguisher.dispatched", extinguisher_id, extinguisher_view(updated_extinguisher))
     
     return {"message": "Fire extinguisher dispatched successfully"}
 
 @api_router.post("/fire-extinguishers/{extinguisher_id}/receive")
 async def receive_extinguisher(extinguisher_id: str):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
+    # Update extinguisher with received status and set refill date
+    now = datetime.utcnow()
+    extinguisher, updated_extinguisher = await update_extinguisher(by_id(extinguisher_id), {
+        "dispatch_status": DispatchStatus.RECEIVED,
+        "received_date": now,
+        "last_refill": now,
+        "next_refill_due": next_refill_due_from(now),
+        "status": ExtinguisherStatus.ACTIVE,
+        "updated_at": now
+    })
     if not extinguisher:
         raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
-    # Update extinguisher with received status and set refill date
-    now = datetime.utcnow()
-    next_refill_due, next_pressure_test_due = calculate_due_dates(now, extinguisher["last_pressure_test"])
-    
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": {
-            "dispatch_status": DispatchStatus.RECEIVED,
-            "received_date": now,
-            "last_refill": now,
-            "next_refill_due": next_refill_due,
-            "status": ExtinguisherStatus.ACTIVE,
-            "updated_at": now
-        }}
-    )
+    await bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"])
+    await emit_change("fire_extinguishers", "extinguisher.received", extinguisher_id, extinguisher_view(updated_extinguisher))
     
     return {"message": "Fire extinguisher received and refill date updated successfully"}
 
 @api_router.put("/fire-extinguishers/{extinguisher_id}/dispatch-status")
 async def update_dispatch_status(extinguisher_id: str, dispatch_status: DispatchStatus):
-    extinguisher = await db.fire_extinguishers.find_one({"id": extinguisher_id})
-    if not extinguisher:
-        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
-    
+    now = datetime.utcnow()
     update_data = {
         "dispatch_status": dispatch_status,
-        "updated_at": datetime.utcnow()
+        "updated_at": now
     }
     
     # If status is being set to received, update refill date
     if dispatch_status == DispatchStatus.RECEIVED:
-        now = datetime.utcnow()
-        next_refill_due, next_pressure_test_due = calculate_due_dates(now, extinguisher["last_pressure_test"])
         update_data.update({
             "received_date": now,
             "last_refill": now,
-            "next_refill_due": next_refill_due,
+            "next_refill_due": next_refill_due_from(now),
             "status": ExtinguisherStatus.ACTIVE
         })
     
-    await db.fire_extinguishers.update_one(
-        {"id": extinguisher_id},
-        {"$set": update_data}
-    )
+    extinguisher, updated_extinguisher = await update_extinguisher(by_id(extinguisher_id), update_data)
+    if not extinguisher:
+        raise HTTPException(status_code=404, detail="Fire extinguisher not found")
     
-    return {"message": "Dispatch status updated successfully"}
-
-@api_router.get("/fire-extinguishers/dispatched")
-async def get_dispatched_extinguishers():
-    extinguishers = await db.fire_extinguishers.find({
-        "dispatch_status": {"$ne": DispatchStatus.NONE}
-    }).to_list(1000)
+    await bump_counters("extinguishers", extinguisher["status"], updated_extinguisher["status"])
+    await emit_change("fire_extinguishers", "extinguisher.dispatch_status_changed", extinguisher_id, extinguisher_view(updated_extinguisher))
     
-    result = []
-    for ext in extinguishers:
-        ext_obj = FireExtinguisher(**ext)
-        result.append(ext_obj)
-    return result
+    return {"message": "Dispatch status updated successfully"}
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -779,6 +2762,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Configure logging
@@ -788,6 +2772,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks = []
+trigger_queue_task = None
+
+@app.on_event("startup")
+async def startup_db_client():
+    global trigger_queue_task
+    await check_uuid_keys()
+    await ensure_indexes()
+    await migrate_embedded_notes()
+    await backfill_updated_at()
+    # Sweep before reconciling so the counters start from current statuses
+    await sweep_extinguisher_status()
+    await sweep_overdue_maintenance()
+    await reconcile_dashboard_counters()
+    background_tasks.append(asyncio.create_task(
+        run_periodically(COUNTER_RECONCILE_INTERVAL, reconcile_dashboard_counters)
+    ))
+    background_tasks.append(asyncio.create_task(
+        run_periodically(EXTINGUISHER_SWEEP_INTERVAL, sweep_extinguisher_status)
+    ))
+    background_tasks.append(asyncio.create_task(
+        run_periodically(MAINTENANCE_SWEEP_INTERVAL, sweep_overdue_maintenance)
+    ))
+    background_tasks.append(asyncio.create_task(
+        run_periodically(ALERT_ARCHIVE_INTERVAL, archive_acknowledged_alerts)
+    ))
+    if WRITE_BEHIND_ENABLED:
+        trigger_queue_task = asyncio.create_task(trigger_queue.run())
+        background_tasks.append(trigger_queue_task)
+    if REDIS_URL and redis_client is None:
+        logger.warning("REDIS_URL is set but the redis package is not installed; the response cache stays per worker")
+    if redis_listener is not None:
+        background_tasks.append(asyncio.create_task(redis_listener.run()))
+        background_tasks.append(asyncio.create_task(event_relay.run()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    trigger_queue.stop()
+    for task in background_tasks:
+        if task is not trigger_queue_task:
+            task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    # Write out anything still queued (or accepted since run() returned) before the connection goes away
+    await trigger_queue.flush()
+    client.close()
+    if redis_client is not None:
+        await redis_client.aclose()
\ No newline at end of file
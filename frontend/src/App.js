@@ -12,12 +12,17 @@ const App = () => {
   const [extinguishers, setExtinguishers] = useState([]);
   const [dispatchedExtinguishers, setDispatchedExtinguishers] = useState([]);
   const [alerts, setAlerts] = useState([]);
+  // Cursor of the alerts older than the loaded ones, null when all are loaded
+  const [alertsCursor, setAlertsCursor] = useState(null);
   const [maintenanceItems, setMaintenanceItems] = useState([]);
+  // Per capped list (keyed like the snapshot's next_cursors), the cursor of what was left out
+  const [listCursors, setListCursors] = useState({});
   const [dashboardData, setDashboardData] = useState({
     detectors: { total: 0, active: 0, triggered: 0 },
     extinguishers: { total: 0, triggered: 0 },
     maintenance: { total: 0, pending: 0, overdue: 0 },
-    recent_alerts: []
+    recent_alerts: [],
+    open_incidents: []
   });
   const [loading, setLoading] = useState(true);
   const [isAdmin, setIsAdmin] = useState(false);
@@ -35,6 +40,8 @@ const App = () => {
   const [editingItem, setEditingItem] = useState(null);
   const [selectedMaintenanceItem, setSelectedMaintenanceItem] = useState(null);
   const [newNote, setNewNote] = useState("");
+  // Note bodies are not part of the maintenance list; loaded per item when expanded
+  const [expandedNotes, setExpandedNotes] = useState({});
   const [newDetector, setNewDetector] = useState({ name: "", location: "", battery_level: 100 });
   const [newExtinguisher, setNewExtinguisher] = useState({ 
     name: "", 
@@ -55,6 +62,7 @@ const App = () => {
     try {
       const response = await axios.get(`${API}/smoke-detectors`);
       setDetectors(response.data);
+      setListCursor("smoke_detectors", response.headers["x-next-cursor"]);
     } catch (error) {
       console.error("Error loading detectors:", error);
     }
@@ -64,24 +72,66 @@ const App = () => {
     try {
       const response = await axios.get(`${API}/fire-extinguishers`);
       setExtinguishers(response.data);
+      setListCursor("fire_extinguishers", response.headers["x-next-cursor"]);
     } catch (error) {
       console.error("Error loading extinguishers:", error);
     }
   };
 
+  const ALERT_PAGE_SIZE = 100;
+  const FALLBACK_POLL_MS = 60000;
+
   const loadAlerts = async () => {
     try {
-      const response = await axios.get(`${API}/alerts`);
-      setAlerts(response.data);
+      const response = await axios.get(`${API}/alerts`, { params: { limit: ALERT_PAGE_SIZE } });
+      setAlerts(response.data.items);
+      setAlertsCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error("Error loading alerts:", error);
+    }
+  };
+
+  const loadOlderAlerts = async () => {
+    try {
+      const response = await axios.get(`${API}/alerts`, { params: { limit: ALERT_PAGE_SIZE, after: alertsCursor } });
+      setAlerts((items) => [...items, ...response.data.items]);
+      setAlertsCursor(response.data.next_cursor);
     } catch (error) {
       console.error("Error loading alerts:", error);
     }
   };
 
+  const LIST_PAGE_SIZE = 500;
+
+  const setListCursor = (name, cursor) => {
+    setListCursors((cursors) => ({ ...cursors, [name]: cursor || null }));
+  };
+
+  const loadMoreItems = async (name) => {
+    const [path, setItems] = {
+      smoke_detectors: ["smoke-detectors", setDetectors],
+      fire_extinguishers: ["fire-extinguishers", setExtinguishers],
+      dispatched_extinguishers: ["fire-extinguishers/dispatched", setDispatchedExtinguishers],
+      maintenance_items: ["maintenance-items", setMaintenanceItems]
+    }[name];
+    try {
+      const response = await axios.get(`${API}/${path}`, { params: { limit: LIST_PAGE_SIZE, after: listCursors[name] } });
+      // Items pushed by change events meanwhile may already be in the list
+      setItems((items) => {
+        const loaded = new Set(items.map((item) => item.id));
+        return [...items, ...response.data.items.filter((item) => !loaded.has(item.id))];
+      });
+      setListCursor(name, response.data.next_cursor);
+    } catch (error) {
+      console.error(`Error loading more ${name}:`, error);
+    }
+  };
+
   const loadMaintenanceItems = async () => {
     try {
       const response = await axios.get(`${API}/maintenance-items`);
       setMaintenanceItems(response.data);
+      setListCursor("maintenance_items", response.headers["x-next-cursor"]);
     } catch (error) {
       console.error("Error loading maintenance items:", error);
     }
@@ -100,23 +150,130 @@ const App = () => {
     try {
       const response = await axios.get(`${API}/fire-extinguishers/dispatched`);
       setDispatchedExtinguishers(response.data);
+      setListCursor("dispatched_extinguishers", response.headers["x-next-cursor"]);
     } catch (error) {
       console.error("Error loading dispatched extinguishers:", error);
     }
   };
 
-  // Initial load
+  const loadSnapshot = async () => {
+    try {
+      const response = await axios.get(`${API}/snapshot`);
+      const snapshot = response.data;
+      setDetectors(snapshot.smoke_detectors);
+      setExtinguishers(snapshot.fire_extinguishers);
+      setDispatchedExtinguishers(snapshot.dispatched_extinguishers);
+      setMaintenanceItems(snapshot.maintenance_items);
+      setAlerts(snapshot.alerts);
+      setAlertsCursor(snapshot.next_cursors.alerts);
+      setListCursors(snapshot.next_cursors);
+      setDashboardData(snapshot.dashboard);
+    } catch (error) {
+      console.error("Error loading snapshot:", error);
+    }
+  };
+
+  // Apply a change event pushed by /api/events to the local lists
+  const upsertById = (items, item, prepend) => {
+    const index = items.findIndex((existing) => existing.id === item.id);
+    if (index === -1) {
+      return prepend ? [item, ...items] : [...items, item];
+    }
+    const next = [...items];
+    next[index] = item;
+    return next;
+  };
+
+  const removeById = (items, id) => items.filter((item) => item.id !== id);
+
+  const renderLoadMore = (name, label) =>
+    listCursors[name] && (
+      <div className="col-span-full p-4 text-center">
+        <button
+          onClick={() => loadMoreItems(name)}
+          className="px-4 py-2 bg-gray-700 text-white rounded hover:bg-gray-600"
+        >
+          {label}
+        </button>
+      </div>
+    );
+
+  const applyChangeEvent = (event) => {
+    // Lists sorted newest first get new entries at the top
+    const targets = {
+      smoke_detectors: [setDetectors, false, loadDetectors],
+      fire_extinguishers: [setExtinguishers, false, loadExtinguishers],
+      maintenance_items: [setMaintenanceItems, true, loadMaintenanceItems],
+      alerts: [setAlerts, true, loadAlerts]
+    };
+    if (!targets[event.collection]) {
+      return;
+    }
+    const [setItems, prepend, reload] = targets[event.collection];
+    // Events without an id come from jobs that changed many documents at once
+    if (!event.id) {
+      reload();
+      if (event.collection === "fire_extinguishers") {
+        loadDispatchedExtinguishers();
+      }
+      return;
+    }
+    if (event.data) {
+      setItems((items) => upsertById(items, event.data, prepend));
+    } else {
+      setItems((items) => removeById(items, event.id));
+    }
+
+    if (event.collection === "fire_extinguishers") {
+      setDispatchedExtinguishers((items) =>
+        event.data && event.data.dispatch_status !== "none"
+          ? upsertById(items, event.data, false)
+          : removeById(items, event.id)
+      );
+    }
+  };
+
+  // Initial load, then live updates pushed over Server-Sent Events
   useEffect(() => {
     const loadData = async () => {
       setLoading(true);
-      await Promise.all([loadDetectors(), loadExtinguishers(), loadAlerts(), loadMaintenanceItems(), loadDashboard(), loadDispatchedExtinguishers()]);
+      await loadSnapshot();
       setLoading(false);
     };
     loadData();
 
-    // Set up polling for real-time updates
-    const interval = setInterval(loadData, 5000);
-    return () => clearInterval(interval);
+    // Coalesce bursts of events into a single dashboard refresh
+    let dashboardTimer = null;
+    const scheduleDashboardReload = () => {
+      clearTimeout(dashboardTimer);
+      dashboardTimer = setTimeout(loadDashboard, 500);
+    };
+
+    let disconnected = false;
+    const events = new EventSource(`${API}/events`);
+    events.onopen = () => {
+      // Changes made while the stream was down were missed; resync once
+      if (disconnected) {
+        disconnected = false;
+        loadSnapshot();
+      }
+    };
+    events.onerror = () => {
+      disconnected = true;
+    };
+    events.onmessage = (message) => {
+      applyChangeEvent(JSON.parse(message.data));
+      scheduleDashboardReload();
+    };
+
+    // Safety net for events that never reached this worker's stream
+    const fallbackPoll = setInterval(loadSnapshot, FALLBACK_POLL_MS);
+
+    return () => {
+      events.close();
+      clearTimeout(dashboardTimer);
+      clearInterval(fallbackPoll);
+    };
   }, []);
 
   // Admin functions
@@ -308,17 +465,46 @@ const App = () => {
   const handleAddNote = async (e) => {
     e.preventDefault();
     try {
-      await axios.post(`${API}/maintenance-items/${selectedMaintenanceItem.id}/notes`, {
+      const response = await axios.post(`${API}/maintenance-items/${selectedMaintenanceItem.id}/notes`, {
         note: newNote
       });
       setNewNote("");
       setShowAddNote(false);
+      if (expandedNotes[response.data.id]) {
+        await loadNotes(response.data.id);
+      }
       await loadMaintenanceItems();
     } catch (error) {
       alert("Error adding note");
     }
   };
 
+  // Notes are paged; after continues from the last loaded page
+  const loadNotes = async (itemId, after = null) => {
+    try {
+      const response = await axios.get(`${API}/maintenance-items/${itemId}/notes`, {
+        params: after ? { after } : {}
+      });
+      setExpandedNotes((notes) => ({
+        ...notes,
+        [itemId]: {
+          items: after ? [...notes[itemId].items, ...response.data.items] : response.data.items,
+          nextCursor: response.data.next_cursor
+        }
+      }));
+    } catch (error) {
+      console.error("Error loading notes:", error);
+    }
+  };
+
+  const toggleNotes = async (item) => {
+    if (expandedNotes[item.id]) {
+      setExpandedNotes(({ [item.id]: _, ...notes }) => notes);
+      return;
+    }
+    await loadNotes(item.id);
+  };
+
   // Action functions
   const triggerDetector = async (detectorId) => {
     try {
@@ -384,6 +570,28 @@ const App = () => {
     }
   };
 
+  const acknowledgeIncident = async (incidentId) => {
+    try {
+      await axios.put(`${API}/incidents/${incidentId}/acknowledge`);
+      await loadAlerts();
+      await loadDashboard();
+    } catch (error) {
+      console.error("Error acknowledging incident:", error);
+    }
+  };
+
+  const acknowledgeAllAlerts = async () => {
+    try {
+      const response = await axios.post(`${API}/alerts/acknowledge`, { until: new Date().toISOString() });
+      if (response.data.acknowledged) {
+        await loadAlerts();
+        await loadDashboard();
+      }
+    } catch (error) {
+      console.error("Error acknowledging alerts:", error);
+    }
+  };
+
   // Dispatch functions
   const dispatchExtinguisher = async (id) => {
     try {
@@ -1223,6 +1431,33 @@ const App = () => {
               </div>
             </div>
 
+            {/* Open Incidents */}
+            {dashboardData.open_incidents && dashboardData.open_incidents.length > 0 && (
+              <div className="bg-gray-800 rounded-lg p-6">
+                <h3 className="text-lg font-semibold mb-4">Open Incidents</h3>
+                <div className="space-y-3">
+                  {dashboardData.open_incidents.map((incident) => (
+                    <div key={incident.id} className="flex items-center justify-between p-3 bg-red-800 rounded-lg">
+                      <div>
+                        <p className="font-medium text-red-100">
+                          {incident.location}: {incident.detector_ids.length + incident.extinguisher_ids.length} devices, {incident.occurrences} triggers
+                        </p>
+                        <p className="text-sm text-red-300">
+                          {formatDate(incident.started_at)} – {formatDate(incident.last_seen)}
+                        </p>
+                      </div>
+                      <button
+                        onClick={() => acknowledgeIncident(incident.id)}
+                        className="px-3 py-1 bg-red-600 text-white rounded hover:bg-red-700"
+                      >
+                        Acknowledge
+                      </button>
+                    </div>
+                  ))}
+                </div>
+              </div>
+            )}
+
             {/* Recent Alerts */}
             <div className="bg-gray-800 rounded-lg p-6">
               <h3 className="text-lg font-semibold mb-4">Recent Alerts</h3>
@@ -1234,7 +1469,10 @@ const App = () => {
                     <div key={alert.id} className="flex items-center justify-between p-3 bg-red-900 rounded-lg">
                       <div>
                         <p className="font-medium text-red-100">{alert.message}</p>
-                        <p className="text-sm text-red-300">{formatDate(alert.timestamp)}</p>
+                        <p className="text-sm text-red-300">
+                          {formatDate(alert.timestamp)}
+                          {alert.occurrences > 1 && ` · ${alert.occurrences} times, last ${formatDate(alert.last_seen)}`}
+                        </p>
                       </div>
                       <button
                         onClick={() => acknowledgeAlert(alert.id)}
@@ -1326,6 +1564,7 @@ const App = () => {
                   )}
                 </div>
               ))}
+              {renderLoadMore("smoke_detectors", "Load More Detectors")}
             </div>
           </div>
         )}
@@ -1477,6 +1716,7 @@ const App = () => {
                     </div>
                   );
                 })}
+                {renderLoadMore("fire_extinguishers", "Load More Extinguishers")}
               </div>
             )}
 
@@ -1562,6 +1802,7 @@ const App = () => {
                     No dispatched extinguishers
                   </div>
                 )}
+                {renderLoadMore("dispatched_extinguishers", "Load More Dispatched Extinguishers")}
               </div>
             )}
           </div>
@@ -1619,19 +1860,41 @@ const App = () => {
                   </div>
                   
                   {/* Notes Section */}
-                  {item.notes && item.notes.length > 0 && (
+                  {item.note_count > 0 && (
                     <div className="mt-4">
-                      <h4 className="text-sm font-medium mb-2">Notes:</h4>
-                      <div className="max-h-32 overflow-y-auto space-y-2">
-                        {item.notes.map((note) => (
-                          <div key={note.id} className="bg-gray-700 p-2 rounded text-sm">
-                            <p>{note.note}</p>
-                            <p className="text-xs text-gray-400 mt-1">
-                              {formatDateTime(note.created_at)} - {note.created_by}
-                            </p>
-                          </div>
-                        ))}
-                      </div>
+                      <button
+                        onClick={() => toggleNotes(item)}
+                        className="text-sm font-medium mb-2 text-blue-400 hover:text-blue-300"
+                      >
+                        {expandedNotes[item.id] ? "Hide" : "Show"} Notes ({item.note_count})
+                      </button>
+                      {expandedNotes[item.id] ? (
+                        <div className="max-h-32 overflow-y-auto space-y-2">
+                          {expandedNotes[item.id].items.map((note) => (
+                            <div key={note.id} className="bg-gray-700 p-2 rounded text-sm">
+                              <p>{note.note}</p>
+                              <p className="text-xs text-gray-400 mt-1">
+                                {formatDateTime(note.created_at)} - {note.created_by}
+                              </p>
+                            </div>
+                          ))}
+                          {expandedNotes[item.id].nextCursor && (
+                            <button
+                              onClick={() => loadNotes(item.id, expandedNotes[item.id].nextCursor)}
+                              className="text-xs text-blue-400 hover:text-blue-300"
+                            >
+                              Load more notes
+                            </button>
+                          )}
+                        </div>
+                      ) : item.latest_note && (
+                        <div className="bg-gray-700 p-2 rounded text-sm">
+                          <p>{item.latest_note.note}</p>
+                          <p className="text-xs text-gray-400 mt-1">
+                            {formatDateTime(item.latest_note.created_at)} - {item.latest_note.created_by}
+                          </p>
+                        </div>
+                      )}
                     </div>
                   )}
                   
@@ -1663,6 +1926,7 @@ const App = () => {
                   </div>
                 </div>
               ))}
+              {renderLoadMore("maintenance_items", "Load More Maintenance Items")}
             </div>
           </div>
         )}
@@ -1671,6 +1935,14 @@ const App = () => {
           <div className="space-y-6">
             <div className="flex justify-between items-center">
               <h2 className="text-2xl font-bold">Alert History</h2>
+              {alerts.some((alert) => !alert.acknowledged) && (
+                <button
+                  onClick={acknowledgeAllAlerts}
+                  className="px-4 py-2 bg-red-600 text-white rounded hover:bg-red-700"
+                >
+                  Acknowledge All
+                </button>
+              )}
             </div>
             <div className="bg-gray-800 rounded-lg overflow-hidden">
               <div className="overflow-x-auto">
@@ -1688,7 +1960,14 @@ const App = () => {
                       <tr key={alert.id} className={`${alert.acknowledged ? "bg-gray-800" : "bg-red-900"}`}>
                         <td className="px-6 py-4 text-sm">{formatDate(alert.timestamp)}</td>
                         <td className="px-6 py-4 text-sm">{alert.detector_location || alert.extinguisher_location}</td>
-                        <td className="px-6 py-4 text-sm">{alert.message}</td>
+                        <td className="px-6 py-4 text-sm">
+                          {alert.message}
+                          {alert.occurrences > 1 && (
+                            <span className="ml-2 px-2 py-1 text-xs bg-gray-700 text-gray-200 rounded">
+                              ×{alert.occurrences}
+                            </span>
+                          )}
+                        </td>
                         <td className="px-6 py-4 text-sm">
                           {alert.acknowledged ? (
                             <span className="px-2 py-1 text-xs bg-green-600 text-white rounded">Acknowledged</span>
@@ -1706,6 +1985,16 @@ const App = () => {
                   </tbody>
                 </table>
               </div>
+              {alertsCursor && (
+                <div className="p-4 text-center">
+                  <button
+                    onClick={loadOlderAlerts}
+                    className="px-4 py-2 bg-gray-700 text-white rounded hover:bg-gray-600"
+                  >
+                    Load Older Alerts
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         )}
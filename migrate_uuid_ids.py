@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Re-key existing documents on their binary UUID
+Older deployments stored every document under a generated ObjectId _id with the string id next to it.
+This copies each such document under _id = UUID(id) (BSON binary subtype 4) and removes the ObjectId
+copy. It works in batches ordered by _id and can be stopped and re-run at any point; documents that
+were already copied are skipped.
+
+Run it before starting the new server version; the server refuses to start while ObjectId keys remain.
+
+Usage: MONGO_URL=... DB_NAME=... python migrate_uuid_ids.py [batch_size]
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+from bson import Binary, ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+client = AsyncIOMotorClient(mongo_url, uuidRepresentation="standard")
+db = client[os.environ.get("DB_NAME", "test_database")]
+
+COLLECTIONS = ["smoke_detectors", "fire_extinguishers", "maintenance_items", "alerts"]
+
+DUPLICATE_KEY = 11000
+
+async def migrate_collection(collection, batch_size):
+    migrated, invalid = 0, []
+    last = ObjectId("0" * 24)
+    while True:
+        batch = await collection.find(
+            {"_id": {"$type": "objectId", "$gt": last}}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last = batch[-1]["_id"]
+        copies, keys = [], {}
+        for doc in batch:
+            try:
+                key = Binary.from_uuid(uuid.UUID(doc.get("id") or ""))
+            except ValueError:
+                invalid.append(doc["_id"])
+                continue
+            keys[doc["_id"]] = key
+            copies.append({**doc, "_id": key})
+        if copies:
+            try:
+                await collection.insert_many(copies, ordered=False)
+            except BulkWriteError as e:
+                # A previous run copied these already
+                errors = [error for error in e.details["writeErrors"] if error["code"] != DUPLICATE_KEY]
+                if errors:
+                    raise
+            # Only remove originals whose copy is in place
+            copied = set(await collection.distinct("_id", {"_id": {"$in": list(keys.values())}}))
+            old_ids = [old_id for old_id, key in keys.items() if key in copied]
+            await collection.delete_many({"_id": {"$in": old_ids}})
+            migrated += len(old_ids)
+    return migrated, invalid
+
+async def main(batch_size):
+    clean = True
+    for name in COLLECTIONS:
+        migrated, invalid = await migrate_collection(db[name], batch_size)
+        print(f"{name}: re-keyed {migrated} documents")
+        if invalid:
+            clean = False
+            print(f"  {len(invalid)} documents have no valid UUID id and were left as they are:")
+            for object_id in invalid:
+                print(f"    {object_id}")
+    if not clean:
+        print("Fix or remove the documents above, then re-run")
+        return 1
+    print("Done")
+    return 0
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sys.exit(asyncio.run(main(batch_size)))
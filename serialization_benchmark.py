@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the list endpoints
+Compares the per-row cost of building a model per document and letting FastAPI validate it
+against response_model (the old path) with the trusted-document orjson path (FAST_SERIALIZATION).
+No database is needed; documents are generated in the shape Mongo returns them.
+
+Usage: python serialization_benchmark.py [rows] [repeats]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).parent / "backend"))
+# The client connects lazily, nothing is contacted
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import server
+
+def make_docs(rows):
+    now = datetime.utcnow()
+    detectors, extinguishers, items, alerts = [], [], [], []
+    for i in range(rows):
+        detectors.append({
+            "id": str(uuid.uuid4()),
+            "name": f"Smoke Detector {i}",
+            "location": f"Building A - Floor {i % 10}",
+            "status": "active",
+            "last_triggered": None,
+            "battery_level": 85,
+            "created_at": now,
+            "updated_at": now,
+        })
+        extinguishers.append({
+            "id": str(uuid.uuid4()),
+            "name": f"Extinguisher {i}",
+            "location": f"Building A - Floor {i % 10}",
+            "status": "active",
+            "dispatch_status": "none",
+            "last_triggered": None,
+            "last_refill": now - timedelta(days=100),
+            "last_pressure_test": now - timedelta(days=100),
+            "next_refill_due": now + timedelta(days=265),
+            "next_pressure_test_due": now + timedelta(days=995),
+            "dispatch_date": None,
+            "received_date": None,
+            "days_until_refill": 264,
+            "days_until_pressure_test": 994,
+            "created_at": now,
+            "updated_at": now,
+        })
+        items.append({
+            "id": str(uuid.uuid4()),
+            "name": f"Inspection {i}",
+            "description": "Quarterly inspection",
+            "status": "pending",
+            "priority": "medium",
+            "assigned_to": None,
+            "due_date": now + timedelta(days=30),
+            "note_count": 3,
+            "latest_note": {"id": str(uuid.uuid4()), "item_id": None, "note": "Checked", "created_at": now, "created_by": "user"},
+            "created_at": now,
+            "updated_at": now,
+        })
+        alerts.append({
+            "id": str(uuid.uuid4()),
+            "detector_id": str(uuid.uuid4()),
+            "extinguisher_id": None,
+            "detector_name": f"Smoke Detector {i}",
+            "extinguisher_name": None,
+            "detector_location": f"Building A - Floor {i % 10}",
+            "extinguisher_location": None,
+            "message": "SMOKE DETECTED",
+            "timestamp": now,
+            "acknowledged": False,
+            "updated_at": now,
+        })
+    return {
+        server.SmokeDetector: detectors,
+        server.FireExtinguisher: extinguishers,
+        server.MaintenanceItem: items,
+        server.Alert: alerts,
+    }
+
+async def model_path(model, docs):
+    # What the handlers did before: a model per row, then response_model validation
+    field = create_response_field(name="response", type_=List[model])
+    content = await serialize_response(field=field, response_content=[model(**doc) for doc in docs])
+    return JSONResponse(content).body
+
+async def fast_path(model, docs):
+    return ORJSONResponse(server.serialize_docs(model, docs)).body
+
+async def best_time(path, model, docs, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await path(model, docs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+async def main(rows, repeats):
+    if not server.FAST_SERIALIZATION:
+        print("FAST_SERIALIZATION is off (or orjson is missing); the fast path would not be used")
+        return
+    print(f"{rows} rows, best of {repeats} runs, microseconds per row")
+    print(f"{'model':<18}{'before':>10}{'after':>10}{'speedup':>10}")
+    for model, docs in make_docs(rows).items():
+        before = await best_time(model_path, model, docs, repeats)
+        after = await best_time(fast_path, model, docs, repeats)
+        print(f"{model.__name__:<18}{before / rows * 1e6:>10.2f}{after / rows * 1e6:>10.2f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(main(rows, repeats))
@@ -9,7 +9,7 @@ import uuid
 
 # MongoDB connection
 mongo_url = "mongodb://localhost:27017"
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, uuidRepresentation="standard")
 db = client["test_database"]
 
 async def setup_sample_data():
@@ -117,7 +117,9 @@ async def setup_sample_data():
         }
     ]
     
-    # Insert sample data
+    # Insert sample data, keyed by the binary form of each id like the server does
+    for doc in smoke_detectors + fire_extinguishers:
+        doc["_id"] = uuid.UUID(doc["id"])
     await db.smoke_detectors.insert_many(smoke_detectors)
     await db.fire_extinguishers.insert_many(fire_extinguishers)
     
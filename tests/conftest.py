@@ -0,0 +1,57 @@
+"""
+Fixtures for the backend tests
+The app runs against an in-memory Mongo (mongomock-motor); Redis paths use fakeredis.
+Both are test-only requirements; without mongomock-motor the tests are not collected.
+
+Usage: python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+try:
+    import mongomock_motor
+except ImportError:
+    collect_ignore_glob = ["test_*.py"]
+else:
+    import motor.motor_asyncio
+    # server creates its client at import time
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = "fire_safety_tests"
+# Cached responses would outlive the database reset between tests; cache tests turn it back on
+os.environ["RESPONSE_CACHE_TTL"] = "0"
+os.environ.pop("REDIS_URL", None)
+
+ADMIN = ("admin", "firesafety2025")
+
+@pytest.fixture
+def server():
+    import server
+    return server
+
+@pytest.fixture
+def client(server):
+    from fastapi.testclient import TestClient
+    with TestClient(server.app) as test_client:
+        yield test_client
+    asyncio.run(server.client.drop_database(os.environ["DB_NAME"]))
+
+@pytest.fixture
+def run(client):
+    """Run a coroutine function on the app's event loop."""
+    return client.portal.call
+
+@pytest.fixture
+def detector(client):
+    def create(location="Main Office - Floor 1", name="Detector"):
+        response = client.post("/api/admin/smoke-detectors", json={"name": name, "location": location}, auth=ADMIN)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
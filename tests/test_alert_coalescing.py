@@ -0,0 +1,38 @@
+def alerts_of(client, detector_id):
+    return client.get("/api/alerts", params={"detector_id": detector_id}).json()
+
+def test_repeat_triggers_fold_into_the_open_alert(client, detector):
+    created = detector()
+    for _ in range(3):
+        assert client.post(f"/api/smoke-detectors/{created['id']}/trigger").status_code == 200
+    [alert] = alerts_of(client, created["id"])
+    assert alert["occurrences"] == 3
+    assert alert["last_seen"] >= alert["timestamp"]
+
+def test_a_trigger_after_acknowledging_opens_a_new_alert(client, detector):
+    created = detector()
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    [first] = alerts_of(client, created["id"])
+    assert client.put(f"/api/alerts/{first['id']}/acknowledge").status_code == 200
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    alerts = alerts_of(client, created["id"])
+    assert len(alerts) == 2
+    assert [alert["occurrences"] for alert in alerts] == [1, 1]
+
+def test_batched_triggers_join_the_alert_of_an_earlier_trigger(client, detector):
+    created = detector()
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    events = [{"detector_id": created["id"], "type": "trigger"}] * 2
+    results = client.post("/api/ingest/detector-events", json=events).json()["results"]
+    [alert] = alerts_of(client, created["id"])
+    assert alert["occurrences"] == 3
+    assert {result["alert_id"] for result in results} == {alert["id"]}
+
+def test_coalescing_off_raises_an_alert_per_trigger(client, server, detector, monkeypatch):
+    monkeypatch.setattr(server, "ALERT_COALESCE_WINDOW_SECONDS", 0)
+    created = detector()
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    client.post("/api/ingest/detector-events", json=[{"detector_id": created["id"], "type": "trigger"}] * 2)
+    alerts = alerts_of(client, created["id"])
+    assert len(alerts) == 3
+    assert {alert["occurrences"] for alert in alerts} == {1}
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta
+
+from .conftest import ADMIN
+
+def store_alerts(server, run, count, **fields):
+    alerts = [server.Alert(message=f"Alert {n}", **fields) for n in range(count)]
+    async def insert():
+        await server.db.alerts.insert_many([server.to_document(alert) for alert in alerts])
+    run(insert)
+    return [alert.id for alert in alerts]
+
+def test_archiving_announces_each_batch_with_one_event(client, server, run):
+    old = datetime.utcnow() - timedelta(days=server.ALERT_RETENTION_DAYS + 1)
+    store_alerts(server, run, 150, acknowledged=True, timestamp=old)
+    kept = store_alerts(server, run, 1, acknowledged=True)
+    stream = server.event_broker.subscribe()
+    try:
+        assert client.post("/api/admin/alerts/archive", auth=ADMIN).json()["archived"] == 150
+        events = [json.loads(stream.get_nowait()) for _ in range(stream.qsize())]
+    finally:
+        server.event_broker.unsubscribe(stream)
+    assert [(event["type"], event["id"]) for event in events] == [("alert.archived", None)]
+    assert [alert["id"] for alert in client.get("/api/alerts").json()] == kept
+    assert len(client.get("/api/admin/alerts/archive", params={"limit": 500}, auth=ADMIN).json()["items"]) == 150
+
+def test_bulk_acknowledge_by_ids_and_by_filter(client, server, run):
+    picked = store_alerts(server, run, 3)
+    by_detector = store_alerts(server, run, 2, detector_id="detector-1")
+    other = store_alerts(server, run, 1, detector_id="detector-2")
+
+    response = client.post("/api/alerts/acknowledge", json={"ids": picked[:2]})
+    assert response.json()["acknowledged"] == 2
+    response = client.post("/api/alerts/acknowledge", json={"detector_id": "detector-1"})
+    assert response.json()["acknowledged"] == 2
+    # Already acknowledged ones are not counted again
+    assert client.post("/api/alerts/acknowledge", json={"ids": picked}).json()["acknowledged"] == 1
+
+    acknowledged = {alert["id"] for alert in client.get("/api/alerts", params={"acknowledged": True}).json()}
+    assert acknowledged == set(picked + by_detector)
+    assert [alert["id"] for alert in client.get("/api/alerts", params={"acknowledged": False}).json()] == other
+
+def test_bulk_delete_by_filter_goes_in_batches_and_leaves_tombstones(client, server, run, monkeypatch):
+    monkeypatch.setattr(server, "ALERT_DELETE_BATCH_SIZE", 2)
+    old = datetime.utcnow() - timedelta(days=2)
+    doomed = store_alerts(server, run, 5, timestamp=old)
+    kept = store_alerts(server, run, 1)
+    since = datetime.utcnow() - timedelta(minutes=1)
+
+    response = client.post("/api/alerts/delete", json={"until": (old + timedelta(seconds=1)).isoformat()})
+    assert response.json()["deleted"] == 5
+    assert [alert["id"] for alert in client.get("/api/alerts").json()] == kept
+    deleted = client.get("/api/sync", params={"since": since.isoformat()}).json()["deleted"]["alerts"]
+    assert sorted(deleted) == sorted(doomed)
+
+def test_bulk_delete_by_ids(client, server, run):
+    alerts = store_alerts(server, run, 3)
+    assert client.post("/api/alerts/delete", json={"ids": alerts[:2] + ["not-a-uuid"]}).json()["deleted"] == 2
+    assert [alert["id"] for alert in client.get("/api/alerts").json()] == alerts[2:]
+
+def test_an_empty_selection_is_rejected(client, server, run):
+    store_alerts(server, run, 1)
+    for action in ("acknowledge", "delete"):
+        assert client.post(f"/api/alerts/{action}", json={}).status_code == 400
+    assert len(client.get("/api/alerts", params={"acknowledged": False}).json()) == 1
@@ -0,0 +1,37 @@
+from .conftest import ADMIN
+
+def stored_extinguisher_counts(server, run):
+    async def read():
+        return (await server.db.dashboard_counters.find_one({"_id": server.DASHBOARD_COUNTERS_ID}))["extinguishers"]
+    return run(read)
+
+def test_overlapping_sweeps_move_the_counters_once(client, server, run, monkeypatch):
+    for name in ("First", "Second"):
+        response = client.post("/api/admin/fire-extinguishers", json={
+            "name": name, "location": "Lab",
+            "last_refill": "2020-01-01T00:00:00", "last_pressure_test": "2020-01-01T00:00:00",
+        }, auth=ADMIN)
+        assert response.status_code == 200, response.text
+
+    async def make_stale():
+        await server.db.fire_extinguishers.update_many({}, {"$set": {"status": "active", "days_until_refill": None}})
+        await server.reconcile_dashboard_counters()
+    run(make_stale)
+    assert stored_extinguisher_counts(server, run)["active"] == 2
+
+    # Another worker's sweep moves the same documents between this sweep's aggregation and its update
+    collection_type = type(server.db.fire_extinguishers)
+    update_many = collection_type.update_many
+    raced = []
+    async def racing_update_many(self, query, *args, **kwargs):
+        if self.name == "fire_extinguishers" and "status" in query and not raced:
+            raced.append(True)
+            await update_many(self, query, *args, **kwargs)
+            await server.bump_counters_bulk("extinguishers", [("active", "refill_due")] * 2)
+        return await update_many(self, query, *args, **kwargs)
+    monkeypatch.setattr(collection_type, "update_many", racing_update_many)
+    run(server.sweep_extinguisher_status)
+
+    counts = stored_extinguisher_counts(server, run)
+    assert counts["refill_due"] == 2
+    assert counts.get("active", 0) == 0
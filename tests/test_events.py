@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+async def wait_for(condition, timeout=3.0):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+def test_relay_delivers_change_events_to_other_workers_in_order(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        first, second = server.EventBroker(), server.EventBroker()
+        first_listener = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        second_listener = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        first_relay = server.ChangeEventRelay(first_listener, first)
+        server.ChangeEventRelay(second_listener, second)
+        first_stream, second_stream = first.subscribe(), second.subscribe()
+        tasks = [asyncio.create_task(listener.run()) for listener in (first_listener, second_listener)]
+        tasks.append(asyncio.create_task(first_relay.run()))
+        await asyncio.sleep(0.1)
+
+        messages = [json.dumps({"collection": "alerts", "type": "created", "id": str(n)}) for n in range(5)]
+        for message in messages:
+            # What publish_change does on the first worker
+            first.publish(message)
+            first_relay.send(message)
+        await wait_for(lambda: second_stream.qsize() == len(messages))
+        await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+        received = [second_stream.get_nowait() for _ in range(second_stream.qsize())]
+        # The first worker's own clients got each event once, not again from Redis
+        return received == messages, first_stream.qsize()
+
+    assert asyncio.run(scenario()) == (True, 5)
+
+def test_relay_ends_local_streams_when_it_resubscribes(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        broker = server.EventBroker()
+        listener = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        server.ChangeEventRelay(listener, broker)
+        stream = broker.subscribe()
+
+        # Events relayed while the subscription was down are lost; clients have to reload
+        redis_server.connected = False
+        task = asyncio.create_task(listener.run())
+        await asyncio.sleep(0.1)
+        kept_while_down = stream.empty()
+        redis_server.connected = True
+        ended = await wait_for(lambda: not stream.empty())
+        task.cancel()
+        return kept_while_down, ended, stream.get_nowait(), stream in broker.subscribers
+
+    assert asyncio.run(scenario()) == (True, True, None, False)
+
+def test_one_subscription_carries_cache_invalidations_and_change_events(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        publishing = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        listening = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        bus = server.CacheInvalidationBus(publishing, server.InMemoryCacheBackend(30, 10))
+        relay = server.ChangeEventRelay(publishing, server.EventBroker())
+        backend = server.InMemoryCacheBackend(30, 10)
+        broker = server.EventBroker()
+        server.CacheInvalidationBus(listening, backend)
+        server.ChangeEventRelay(listening, broker)
+        await backend.put("alerts", ["alerts"], await backend.generation(["alerts"]), {"body": b"[]", "headers": {}})
+        stream = broker.subscribe()
+        tasks = [asyncio.create_task(listening.run()), asyncio.create_task(relay.run())]
+        await asyncio.sleep(0.1)
+        channels = await listening.redis.pubsub_numsub(bus.CHANNEL, relay.CHANNEL)
+
+        await bus.publish("alerts")
+        relay.send("event")
+        delivered = await wait_for(lambda: "alerts" not in backend.entries and stream.qsize() == 1)
+        for task in tasks:
+            task.cancel()
+        return channels, delivered, stream.get_nowait()
+
+    channels, delivered, message = asyncio.run(scenario())
+    assert [count for _, count in channels] == [1, 1]
+    assert delivered and message == "event"
+
+def test_writes_are_relayed_through_publish_change(client, server, detector, monkeypatch):
+    broker = server.EventBroker()
+    relay = server.ChangeEventRelay(server.RedisListener(None), broker)
+    monkeypatch.setattr(server, "event_relay", relay)
+    created = detector(name="Relayed")
+    message = json.loads(relay.outbox.get_nowait())
+    assert (message["collection"], message["type"], message["id"]) == ("smoke_detectors", "detector.created", created["id"])
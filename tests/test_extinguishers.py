@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+
+from .conftest import ADMIN
+
+@pytest.fixture
+def extinguisher(client):
+    def create(serviced):
+        response = client.post("/api/admin/fire-extinguishers", json={
+            "name": "Extinguisher", "location": "Lab",
+            "last_refill": serviced, "last_pressure_test": serviced,
+        }, auth=ADMIN)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+@pytest.mark.parametrize("action", ["refill", "pressure-test"])
+def test_servicing_is_refused_until_due(client, extinguisher, action):
+    due = extinguisher("2020-01-01T00:00:00")
+    fresh = extinguisher(datetime.utcnow().isoformat())
+
+    assert client.post(f"/api/fire-extinguishers/{due['id']}/{action}").status_code == 200
+    # Just serviced, so no longer due
+    assert client.post(f"/api/fire-extinguishers/{due['id']}/{action}").status_code == 400
+    assert client.post(f"/api/fire-extinguishers/{fresh['id']}/{action}").status_code == 400
+    assert client.post(f"/api/fire-extinguishers/missing/{action}").status_code == 404
+
+def test_a_triggered_extinguisher_can_be_refilled_before_it_is_due(client, extinguisher):
+    fresh = extinguisher(datetime.utcnow().isoformat())
+    assert client.post(f"/api/fire-extinguishers/{fresh['id']}/trigger").status_code == 200
+    assert client.post(f"/api/fire-extinguishers/{fresh['id']}/refill").status_code == 200
+    assert client.get(f"/api/fire-extinguishers/{fresh['id']}").json()["status"] == "active"
+    assert client.post(f"/api/fire-extinguishers/{fresh['id']}/pressure-test").status_code == 400
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+def trigger(client, detector_id):
+    response = client.post(f"/api/smoke-detectors/{detector_id}/trigger")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_triggers_in_one_zone_join_its_open_incident(client, detector):
+    first = detector(location="Main Office - Floor 1")
+    second = detector(location="Warehouse - floor 1")
+    elsewhere = detector(location="Main Office - Floor 2")
+
+    opened = trigger(client, first["id"])["incident_id"]
+    assert trigger(client, second["id"])["incident_id"] == opened
+    assert trigger(client, elsewhere["id"])["incident_id"] != opened
+
+    incident = client.get(f"/api/incidents/{opened}").json()
+    assert incident["zone"] == "floor 1"
+    assert incident["occurrences"] == 2
+    assert sorted(incident["detector_ids"]) == sorted([first["id"], second["id"]])
+    assert len(client.get("/api/incidents").json()) == 2
+
+def test_a_trigger_after_the_window_opens_a_new_incident(client, server, run, detector):
+    first, second = detector(name="First"), detector(name="Second")
+    opened = trigger(client, first["id"])["incident_id"]
+    async def age():
+        past = datetime.utcnow() - timedelta(seconds=server.INCIDENT_WINDOW_SECONDS + 60)
+        await server.db.incidents.update_many({}, {"$set": {"started_at": past, "last_seen": past}})
+    run(age)
+    assert trigger(client, second["id"])["incident_id"] != opened
+
+def test_acknowledging_an_incident_acknowledges_its_alerts(client, detector):
+    first, second = detector(name="First"), detector(name="Second")
+    other = detector(location="Main Office - Floor 2")
+    incident_id = trigger(client, first["id"])["incident_id"]
+    trigger(client, second["id"])
+    trigger(client, other["id"])
+
+    response = client.put(f"/api/incidents/{incident_id}/acknowledge")
+    assert response.status_code == 200
+    assert response.json()["alerts_acknowledged"] == 2
+    assert client.get(f"/api/incidents/{incident_id}").json()["acknowledged"] is True
+    unacknowledged = client.get("/api/alerts", params={"acknowledged": False}).json()
+    assert [alert["detector_id"] for alert in unacknowledged] == [other["id"]]
+    assert client.get("/api/alerts", params={"incident_id": incident_id, "acknowledged": True}).json()
+
+    # The zone's next trigger no longer joins the acknowledged incident
+    assert trigger(client, first["id"])["incident_id"] != incident_id
+    assert client.put(f"/api/incidents/{incident_id}/acknowledge").json()["alerts_acknowledged"] == 0
+
+def test_unknown_incident_is_not_found(client):
+    assert client.get("/api/incidents/missing").status_code == 404
+    assert client.put("/api/incidents/missing/acknowledge").status_code == 404
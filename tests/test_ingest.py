@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from .conftest import ADMIN
+
+def test_batch_mixing_naive_and_aware_timestamps_is_applied(client, detector):
+    created = detector()
+    events = [
+        {"detector_id": created["id"], "type": "trigger"},
+        {"detector_id": created["id"], "type": "trigger", "timestamp": "2030-01-01T10:00:00Z"},
+        {"detector_id": created["id"], "type": "trigger", "timestamp": "2030-01-01T12:00:00+02:00"},
+    ]
+    response = client.post("/api/ingest/detector-events", json=events)
+    assert response.status_code == 200, response.text
+    assert response.json()["applied"] == 3
+
+    stored = client.get(f"/api/smoke-detectors/{created['id']}").json()
+    # Both aware times are 10:00 UTC and later than the unstamped trigger
+    assert stored["last_triggered"].startswith("2030-01-01T10:00:00")
+    alert = client.get("/api/alerts", params={"detector_id": created["id"]}).json()[0]
+    assert alert["last_seen"].startswith("2030-01-01T10:00:00")
+
+def test_write_behind_merges_naive_and_aware_timestamps(server):
+    async def scenario():
+        queue = server.WriteBehindQueue(10, 10, 1, 1)
+        await queue.enqueue(server.DetectorEvent(detector_id="d", type="trigger"))
+        await queue.enqueue(server.DetectorEvent(detector_id="d", type="trigger", timestamp="2000-01-01T00:00:00Z"))
+        return list(queue.pending.values())
+
+    [event] = asyncio.run(scenario())
+    # The later, unstamped trigger is kept
+    assert event.timestamp.tzinfo is None and event.timestamp.year > 2000
+
+def test_shutdown_writes_the_batch_in_flight(server, monkeypatch):
+    monkeypatch.setattr(server, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(server, "trigger_queue", server.WriteBehindQueue(100, 500, 0.05, 1))
+    apply_detector_events = server.apply_detector_events
+    async def slow_apply(events):
+        await asyncio.sleep(0.3)
+        return await apply_detector_events(events)
+    monkeypatch.setattr(server, "apply_detector_events", slow_apply)
+
+    try:
+        with TestClient(server.app) as client:
+            detector = client.post("/api/admin/smoke-detectors", json={"name": "Queued", "location": "Lab"}, auth=ADMIN).json()
+            response = client.post("/api/ingest/detector-events", json=[{"detector_id": detector["id"], "type": "trigger"}])
+            assert response.status_code == 202
+            # Let run() take the batch; shutdown starts while it is being written
+            time.sleep(0.1)
+            assert not server.trigger_queue.pending
+        stored = asyncio.run(server.db.smoke_detectors.find_one({"id": detector["id"]}))
+        assert stored["status"] == "triggered"
+        assert asyncio.run(server.db.alerts.count_documents({"detector_id": detector["id"]})) == 1
+    finally:
+        asyncio.run(server.client.drop_database(os.environ["DB_NAME"]))
+
+def test_write_behind_keeps_the_count_and_first_time_of_merged_triggers(client, server, run, detector):
+    created = detector(location="Warehouse - Floor 2")
+    queue = server.WriteBehindQueue(100, 500, 1, 1)
+    times = ["2030-01-01T10:00:05", "2030-01-01T10:00:00", "2030-01-01T10:00:10"]
+
+    async def enqueue_and_flush():
+        for timestamp in times:
+            await queue.enqueue(server.DetectorEvent(detector_id=created["id"], type="trigger", timestamp=timestamp))
+        await queue.flush()
+    run(enqueue_and_flush)
+
+    [alert] = client.get("/api/alerts", params={"detector_id": created["id"]}).json()
+    assert alert["occurrences"] == 3
+    assert alert["timestamp"].startswith("2030-01-01T10:00:00")
+    assert alert["last_seen"].startswith("2030-01-01T10:00:10")
+    [incident] = client.get("/api/incidents").json()
+    assert incident["occurrences"] == 3
+    assert incident["started_at"].startswith("2030-01-01T10:00:00")
+
+def test_ingest_events_carry_the_whole_detector(client, server, detector):
+    created = detector()
+    client.put(f"/api/admin/smoke-detectors/{created['id']}", json={"battery_level": 42}, auth=ADMIN)
+    stream = server.event_broker.subscribe()
+    try:
+        client.post("/api/ingest/detector-events", json=[{"detector_id": created["id"], "type": "trigger"}])
+        events = [json.loads(stream.get_nowait()) for _ in range(stream.qsize())]
+    finally:
+        server.event_broker.unsubscribe(stream)
+    [event] = [event for event in events if event["collection"] == "smoke_detectors"]
+    assert event["type"] == "detector.triggered"
+    assert event["data"] == client.get(f"/api/smoke-detectors/{created['id']}").json()
+    assert event["data"]["battery_level"] == 42
+
+def test_a_large_batch_is_announced_without_overflowing_streams(client, server, detector):
+    detector_ids = [detector(name=f"Detector {n}")["id"] for n in range(60)]
+    stream = server.event_broker.subscribe()
+    try:
+        response = client.post("/api/ingest/detector-events", json=[{"detector_id": detector_id, "type": "trigger"} for detector_id in detector_ids])
+        assert response.json()["applied"] == 60
+        assert stream in server.event_broker.subscribers
+        events = [json.loads(stream.get_nowait()) for _ in range(stream.qsize())]
+    finally:
+        server.event_broker.unsubscribe(stream)
+    assert [(event["collection"], event["type"], event["id"]) for event in events if event["collection"] != "incidents"] == [
+        ("smoke_detectors", "detector.bulk_updated", None),
+        ("alerts", "alert.bulk_raised", None),
+    ]
+
+def test_late_events_do_not_overwrite_newer_state(client, detector):
+    created = detector()
+    def ingest(*events):
+        response = client.post("/api/ingest/detector-events", json=[{"detector_id": created["id"], **event} for event in events])
+        assert response.json()["applied"] == len(events)
+    def stored():
+        return client.get(f"/api/smoke-detectors/{created['id']}").json()
+
+    ingest(
+        {"type": "trigger", "timestamp": "2030-01-01T10:00:00"},
+        {"type": "battery", "battery_level": 80, "timestamp": "2030-01-01T10:00:00"},
+        {"type": "battery", "battery_level": 90, "timestamp": "2030-01-01T09:00:00"},
+    )
+    assert stored()["battery_level"] == 80
+
+    # A retried batch from earlier that day
+    ingest(
+        {"type": "trigger", "timestamp": "2030-01-01T08:00:00"},
+        {"type": "battery", "battery_level": 95, "timestamp": "2030-01-01T08:00:00"},
+    )
+    assert stored()["last_triggered"].startswith("2030-01-01T10:00:00")
+    assert stored()["battery_level"] == 80
+
+    ingest({"type": "battery", "battery_level": 70, "timestamp": "2030-01-01T11:00:00"})
+    assert stored()["battery_level"] == 70
+    assert stored()["battery_reported_at"].startswith("2030-01-01T11:00:00")
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+def create_item(client, name="Sprinkler check"):
+    response = client.post("/api/maintenance-items", json={"name": name})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def add_note(client, item_id, note):
+    return client.post(f"/api/maintenance-items/{item_id}/notes", json={"note": note})
+
+def notes_of(client, item_id, **params):
+    response = client.get(f"/api/maintenance-items/{item_id}/notes", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_notes_are_paged_oldest_first(client):
+    item = create_item(client)
+    for n in range(5):
+        assert add_note(client, item["id"], f"Note {n}").status_code == 200
+
+    first = notes_of(client, item["id"], limit=2)
+    second = notes_of(client, item["id"], limit=2, after=first["next_cursor"])
+    last = notes_of(client, item["id"], limit=2, after=second["next_cursor"])
+    pages = [first, second, last]
+    assert [note["note"] for page in pages for note in page["items"]] == [f"Note {n}" for n in range(5)]
+    assert last["next_cursor"] is None
+
+    stored = client.get("/api/maintenance-items").json()[0]
+    assert stored["note_count"] == 5
+    assert stored["latest_note"]["note"] == "Note 4"
+
+def test_notes_of_a_missing_item_are_not_found(client, server, run):
+    assert client.get("/api/maintenance-items/missing/notes").status_code == 404
+    assert add_note(client, "missing", "Lost").status_code == 404
+    # The note inserted ahead of the item update is taken back
+    assert run(server.db.maintenance_notes.count_documents, {}) == 0
+    # An item without notes is an empty page, not a missing item
+    item = create_item(client)
+    assert notes_of(client, item["id"]) == {"items": [], "next_cursor": None}
+
+def test_migrating_embedded_notes_is_idempotent(client, server, run):
+    item = server.MaintenanceItem(name="Legacy")
+    written = datetime.utcnow() - timedelta(days=1)
+    embedded = [
+        server.MaintenanceNote(note=f"Old {n}", created_at=written + timedelta(minutes=n)).dict(exclude={"item_id"})
+        for n in range(3)
+    ]
+    async def store_legacy_item():
+        legacy = server.to_document(item)
+        del legacy["note_count"], legacy["latest_note"]
+        await server.db.maintenance_items.insert_one({**legacy, "notes": embedded})
+        # A run interrupted after copying one note
+        await server.db.maintenance_notes.insert_one(server.to_document(server.MaintenanceNote(**embedded[0], item_id=item.id)))
+    run(store_legacy_item)
+
+    assert run(server.migrate_embedded_notes) == 1
+    assert run(server.migrate_embedded_notes) == 0
+
+    assert [note["note"] for note in notes_of(client, item.id)["items"]] == ["Old 0", "Old 1", "Old 2"]
+    stored = client.get("/api/maintenance-items").json()[0]
+    assert stored["note_count"] == 3
+    assert stored["latest_note"]["note"] == "Old 2"
+    assert "notes" not in run(server.db.maintenance_items.find_one, {})
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+@pytest.fixture
+def legacy_db(server, monkeypatch):
+    """The test database with documents as older deployments stored them: ObjectId _id, string id."""
+    import migrate_uuid_ids
+    # In-memory clients don't share their data; run the migration on the server's database
+    monkeypatch.setattr(migrate_uuid_ids, "db", server.db)
+    ids = [str(uuid.uuid4()) for _ in range(5)]
+    async def insert():
+        await server.db.smoke_detectors.insert_many([
+            {"id": detector_id, "name": f"Detector {n}", "location": "Lab", "status": "active", "battery_level": 100}
+            for n, detector_id in enumerate(ids)
+        ])
+        await server.db.alerts.insert_one({"id": "not-a-uuid", "message": "Broken"})
+    asyncio.run(insert())
+    yield migrate_uuid_ids, ids
+    asyncio.run(server.client.drop_database(os.environ["DB_NAME"]))
+
+def count_object_ids(server, name):
+    return asyncio.run(server.db[name].count_documents({"_id": {"$type": "objectId"}}))
+
+def test_migration_rekeys_documents_and_can_be_rerun(server, legacy_db):
+    migrate_uuid_ids, ids = legacy_db
+    # The alert without a valid UUID is reported and left in place
+    assert asyncio.run(migrate_uuid_ids.main(2)) == 1
+    assert count_object_ids(server, "smoke_detectors") == 0
+    assert count_object_ids(server, "alerts") == 1
+    assert asyncio.run(migrate_uuid_ids.main(2)) == 1
+    assert asyncio.run(server.db.smoke_detectors.count_documents({})) == 5
+
+    async def remove_broken():
+        await server.db.alerts.delete_many({"id": "not-a-uuid"})
+    asyncio.run(remove_broken())
+    assert asyncio.run(migrate_uuid_ids.main(2)) == 0
+
+    with TestClient(server.app) as client:
+        for detector_id in ids:
+            assert client.get(f"/api/smoke-detectors/{detector_id}").json()["id"] == detector_id
+
+def test_server_refuses_to_start_on_unmigrated_documents(server, legacy_db):
+    with pytest.raises(RuntimeError, match="migrate_uuid_ids.py"):
+        with TestClient(server.app):
+            pass
+
+def test_an_interrupted_copy_is_completed(server, legacy_db):
+    migrate_uuid_ids, ids = legacy_db
+    # A previous run copied the first detector but stopped before removing the original
+    async def copy_first():
+        original = await server.db.smoke_detectors.find_one({"id": ids[0]})
+        await server.db.smoke_detectors.insert_one({**original, "_id": server.uuid_key(ids[0])})
+    asyncio.run(copy_first())
+    asyncio.run(migrate_uuid_ids.main(2))
+    assert count_object_ids(server, "smoke_detectors") == 0
+    assert sorted(asyncio.run(server.db.smoke_detectors.distinct("id"))) == sorted(ids)
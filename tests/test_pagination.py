@@ -0,0 +1,94 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+def test_pages_cover_the_list_once_in_order(client, detector):
+    created = [detector(name=f"Detector {i}")["id"] for i in range(7)]
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"after": cursor} if cursor else {})}
+        page = client.get("/api/smoke-detectors", params=params).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == created
+
+def test_ties_on_the_sort_field_are_broken_by_id(client, run, server, detector):
+    created = [detector(name=f"Detector {i}")["id"] for i in range(5)]
+    same_time = datetime(2026, 1, 1)
+    async def flatten_timestamps():
+        await server.db.smoke_detectors.update_many({}, {"$set": {"created_at": same_time}})
+    run(flatten_timestamps)
+
+    first = client.get("/api/smoke-detectors", params={"limit": 2}).json()
+    rest = client.get("/api/smoke-detectors", params={"limit": 10, "after": first["next_cursor"]}).json()
+    ids = [item["id"] for item in first["items"] + rest["items"]]
+    assert sorted(ids) == sorted(created)
+    assert len(set(ids)) == 5
+
+def encoded(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    encoded(["2026-01-01", "not-a-uuid"]),
+    encoded(["2026-01-01", 5]),
+    encoded([5, "0b1c6d1e-9a52-4a49-9a3e-2f0f6d0c1a11"]),
+    encoded(["2026-01-01", None]),
+    encoded({"sort": "2026-01-01"}),
+    encoded(None),
+])
+def test_invalid_cursor_is_a_bad_request(client, cursor):
+    response = client.get("/api/smoke-detectors", params={"after": cursor})
+    assert response.status_code == 400
+
+def test_unpaginated_list_is_capped_with_the_rest_in_a_header(client, server, monkeypatch, detector):
+    monkeypatch.setattr(server, "DEFAULT_LIST_LIMIT", 2)
+    created = [detector(name=f"Detector {i}")["id"] for i in range(3)]
+    response = client.get("/api/smoke-detectors")
+    assert [item["id"] for item in response.json()] == created[:2]
+    rest = client.get("/api/smoke-detectors", params={"after": response.headers["x-next-cursor"]}).json()
+    assert [item["id"] for item in rest["items"]] == created[2:]
+    assert rest["next_cursor"] is None
+
+def test_complete_list_has_no_cursor_header(client, detector):
+    detector()
+    assert "x-next-cursor" not in client.get("/api/smoke-detectors").headers
+
+def test_snapshot_caps_alerts_and_returns_their_cursor(client, server, monkeypatch, detector):
+    monkeypatch.setattr(server, "SNAPSHOT_ALERT_LIMIT", 2)
+    monkeypatch.setattr(server, "ALERT_COALESCE_WINDOW_SECONDS", 0)
+    device = detector()
+    alert_ids = [client.post(f"/api/smoke-detectors/{device['id']}/trigger").json()["alert_id"] for _ in range(3)]
+    snapshot = client.get("/api/snapshot").json()
+    assert [alert["id"] for alert in snapshot["alerts"]] == alert_ids[:0:-1]
+    older = client.get("/api/alerts", params={"limit": 10, "after": snapshot["next_cursors"]["alerts"]}).json()
+    assert [alert["id"] for alert in older["items"]] == alert_ids[:1]
+    assert snapshot["next_cursors"]["smoke_detectors"] is None
+
+def test_snapshot_lists_dispatched_extinguishers_beyond_the_cap(client, server, monkeypatch):
+    from .conftest import ADMIN
+    monkeypatch.setattr(server, "DEFAULT_LIST_LIMIT", 1)
+    extinguishers = [
+        client.post("/api/admin/fire-extinguishers", auth=ADMIN, json={
+            "name": f"FE-{i}", "location": "Lobby - Floor 1",
+            "last_refill": "2026-01-01T00:00:00", "last_pressure_test": "2026-01-01T00:00:00",
+        }).json()
+        for i in range(2)
+    ]
+    client.post(f"/api/fire-extinguishers/{extinguishers[1]['id']}/dispatch")
+    snapshot = client.get("/api/snapshot").json()
+    assert [item["id"] for item in snapshot["fire_extinguishers"]] == [extinguishers[0]["id"]]
+    assert [item["id"] for item in snapshot["dispatched_extinguishers"]] == [extinguishers[1]["id"]]
+
+@pytest.mark.parametrize("within_days", [-1, 3651, 10**12])
+def test_due_window_out_of_range_is_rejected(client, within_days):
+    assert client.get("/api/fire-extinguishers/due", params={"within_days": within_days}).status_code == 422
+
+def test_due_window_at_its_bound_is_served(client):
+    response = client.get("/api/fire-extinguishers/due", params={"within_days": 3650})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
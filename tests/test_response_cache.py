@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from .conftest import ADMIN
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def entry(body):
+    return {"body": body, "headers": {"etag": '"v1"'}}
+
+def test_redis_backend_stores_and_invalidates_by_tag(server):
+    async def scenario():
+        backend = server.RedisCacheBackend(fakeredis.FakeAsyncRedis(), 30)
+        await backend.put("both", ["alerts", "smoke_detectors"], await backend.generation(["alerts", "smoke_detectors"]), entry(b"[1]"))
+        await backend.put("detectors", ["smoke_detectors"], await backend.generation(["smoke_detectors"]), entry(b"[2]"))
+        assert (await backend.get("both"))["body"] == b"[1]"
+        assert (await backend.get("both"))["headers"] == {"etag": '"v1"'}
+
+        await backend.invalidate("alerts")
+        assert await backend.get("both") is None
+        assert (await backend.get("detectors"))["body"] == b"[2]"
+
+        await backend.clear()
+        assert await backend.get("detectors") is None
+        return await backend.info()
+
+    info = asyncio.run(scenario())
+    assert info["hits"] == 3
+    assert info["invalidations"] == 2
+
+def test_redis_backend_drops_entries_computed_across_an_invalidation(server):
+    async def scenario():
+        backend = server.RedisCacheBackend(fakeredis.FakeAsyncRedis(), 30)
+        generation = await backend.generation(["alerts"])
+        await backend.invalidate("alerts")
+        await backend.put("alerts", ["alerts"], generation, entry(b"[1]"))
+        return await backend.get("alerts")
+
+    assert asyncio.run(scenario()) is None
+
+def test_redis_backend_put_aborts_when_invalidated_during_the_transaction(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        other_worker = fakeredis.FakeAsyncRedis(server=redis_server)
+        backend = server.RedisCacheBackend(redis, 30)
+        generation = await backend.generation(["alerts"])
+
+        # Another worker invalidates right after the generation check, before EXEC
+        pipeline = redis.pipeline
+        def racing_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            mget = pipe.mget
+            async def mget_then_invalidate(keys):
+                values = await mget(keys)
+                await other_worker.incr(keys[0])
+                return values
+            pipe.mget = mget_then_invalidate
+            return pipe
+        redis.pipeline = racing_pipeline
+
+        await backend.put("alerts", ["alerts"], generation, entry(b"[1]"))
+        return await backend.get("alerts"), backend.stats["errors"]
+
+    assert asyncio.run(scenario()) == (None, 0)
+
+def test_redis_backend_treats_an_unreachable_server_as_a_miss(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        backend = server.RedisCacheBackend(fakeredis.FakeAsyncRedis(server=redis_server), 30)
+        redis_server.connected = False
+        generation = await backend.generation(["alerts"])
+        await backend.put("alerts", ["alerts"], generation, entry(b"[1]"))
+        return await backend.get("alerts"), backend.stats["errors"]
+
+    cached, errors = asyncio.run(scenario())
+    assert cached is None
+    # The failed write and the failed read; neither raised
+    assert errors == 2
+
+async def wait_for(condition, timeout=3.0):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+def test_invalidation_bus_relays_to_other_workers_only(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        first = server.InMemoryCacheBackend(30, 10)
+        second = server.InMemoryCacheBackend(30, 10)
+        first_listener = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        second_listener = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        first_bus = server.CacheInvalidationBus(first_listener, first)
+        server.CacheInvalidationBus(second_listener, second)
+        tasks = [asyncio.create_task(first_listener.run()), asyncio.create_task(second_listener.run())]
+        await asyncio.sleep(0.1)
+        for backend in (first, second):
+            await backend.put("alerts", ["alerts"], await backend.generation(["alerts"]), entry(b"[1]"))
+
+        # The publishing worker invalidates locally itself (invalidate_cache); the bus skips it
+        await first_bus.publish("alerts")
+        relayed = await wait_for(lambda: "alerts" not in second.entries)
+        for task in tasks:
+            task.cancel()
+        return relayed, "alerts" in first.entries
+
+    assert asyncio.run(scenario()) == (True, True)
+
+def test_invalidation_bus_clears_local_cache_when_it_resubscribes(server):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        backend = server.InMemoryCacheBackend(30, 10)
+        listener = server.RedisListener(fakeredis.FakeAsyncRedis(server=redis_server))
+        server.CacheInvalidationBus(listener, backend)
+        await backend.put("alerts", ["alerts"], await backend.generation(["alerts"]), entry(b"[1]"))
+
+        # Subscribing fails while Redis is down; invalidations of that time were missed
+        redis_server.connected = False
+        task = asyncio.create_task(listener.run())
+        await asyncio.sleep(0.1)
+        kept_while_down = "alerts" in backend.entries
+        redis_server.connected = True
+        cleared = await wait_for(lambda: "alerts" not in backend.entries)
+        task.cancel()
+        return kept_while_down, cleared
+
+    assert asyncio.run(scenario()) == (True, True)
+
+@pytest.fixture(params=["memory", "redis"])
+def cached_client(request, client, server, monkeypatch):
+    monkeypatch.setattr(server, "RESPONSE_CACHE_TTL", 30.0)
+    if request.param == "redis":
+        backend = server.RedisCacheBackend(fakeredis.FakeAsyncRedis(), 30)
+    else:
+        backend = server.InMemoryCacheBackend(30, 256)
+    monkeypatch.setattr(server, "cache_backend", backend)
+    return client
+
+def test_cached_list_is_served_until_a_write(cached_client, detector):
+    client = cached_client
+    detector(name="First")
+    first = client.get("/api/smoke-detectors")
+    again = client.get("/api/smoke-detectors")
+    assert again.json() == first.json()
+    assert client.get("/api/admin/response-cache", auth=ADMIN).json()["hits"] == 1
+    assert client.get("/api/smoke-detectors", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    created = detector(name="Second")
+    after_write = client.get("/api/smoke-detectors")
+    assert created["id"] in [item["id"] for item in after_write.json()]
+    assert after_write.headers["etag"] != first.headers["etag"]
+
+    dashboard = client.get("/api/dashboard").json()
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    assert client.get("/api/dashboard").json()["detectors"]["triggered"] == dashboard["detectors"]["triggered"] + 1
+
+def test_a_backend_must_implement_every_operation(server):
+    class PartialBackend(server.CacheBackend):
+        async def get(self, key):
+            return None
+    with pytest.raises(TypeError):
+        PartialBackend()
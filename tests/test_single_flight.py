@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+def test_identical_concurrent_calls_share_one_execution(server):
+    async def scenario():
+        flight = server.SingleFlight()
+        release = asyncio.Event()
+        executions = []
+        async def load():
+            executions.append(True)
+            await release.wait()
+            return ["row"]
+        callers = [asyncio.create_task(flight.do("key", ["alerts"], load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*callers), len(executions), flight.info()
+
+    results, executions, info = asyncio.run(scenario())
+    assert results == [["row"]] * 5
+    assert executions == 1
+    assert info == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+def test_calls_after_an_invalidation_do_not_join_the_older_flight(server):
+    async def scenario():
+        flight = server.SingleFlight()
+        release = asyncio.Event()
+        versions = iter(["before", "after"])
+        async def load():
+            version = next(versions)
+            await release.wait()
+            return version
+        first = asyncio.create_task(flight.do("key", ["alerts"], load))
+        await asyncio.sleep(0)
+        # A write lands while the first read is running
+        flight.invalidate("alerts")
+        second = asyncio.create_task(flight.do("key", ["alerts"], load))
+        await asyncio.sleep(0)
+        release.set()
+        return await first, await second
+
+    assert asyncio.run(scenario()) == ("before", "after")
+
+def test_a_caller_going_away_does_not_cancel_the_others(server):
+    async def scenario():
+        flight = server.SingleFlight()
+        release = asyncio.Event()
+        async def load():
+            await release.wait()
+            return "rows"
+        leaving = asyncio.create_task(flight.do("key", [], load))
+        staying = asyncio.create_task(flight.do("key", [], load))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await staying
+
+    assert asyncio.run(scenario()) == "rows"
+
+def test_a_failure_reaches_every_caller_and_is_not_kept(server):
+    async def scenario():
+        flight = server.SingleFlight()
+        attempts = []
+        async def load():
+            attempts.append(True)
+            await asyncio.sleep(0)
+            if len(attempts) == 1:
+                raise RuntimeError("database went away")
+            return "rows"
+        callers = [asyncio.create_task(flight.do("key", [], load)) for _ in range(3)]
+        failures = await asyncio.gather(*callers, return_exceptions=True)
+        return failures, await flight.do("key", [], load)
+
+    failures, retried = asyncio.run(scenario())
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    assert retried == "rows"
+
+@pytest.fixture
+def single_flight(server, monkeypatch):
+    monkeypatch.setattr(server, "SINGLE_FLIGHT_ENABLED", True)
+    monkeypatch.setattr(server, "read_flight", server.SingleFlight())
+    return server.read_flight
+
+def test_concurrent_list_reads_hit_the_database_once(client, server, run, detector, single_flight):
+    detector(name="Shared")
+    async def concurrent_reads():
+        return await asyncio.gather(*(
+            server.find_page(server.db.smoke_detectors, {}, "created_at", server.ASCENDING, None, None)
+            for _ in range(4)
+        ))
+    pages = run(concurrent_reads)
+    assert all(page == pages[0] for page in pages)
+    assert single_flight.info()["executions"] == 1
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timedelta
+
+from .conftest import ADMIN
+
+def sync_all(client, **params):
+    """Follow every collection's cursor; returns (watermark, changed ids, deleted ids)."""
+    first = client.get("/api/sync", params=params).json()
+    changed = {name: [doc["id"] for doc in docs] for name, docs in first["changed"].items()}
+    deleted = {name: list(ids) for name, ids in first["deleted"].items()}
+    for name, cursor in first["next_cursors"].items():
+        while cursor:
+            page = client.get("/api/sync", params={**params, "collection": name, "after": cursor}).json()
+            assert "watermark" not in page
+            for collection, docs in page["changed"].items():
+                changed[collection] += [doc["id"] for doc in docs]
+            for collection, ids in page["deleted"].items():
+                deleted[collection] += ids
+            cursor = page["next_cursors"][name]
+    return first["watermark"], changed, deleted
+
+def test_full_sync_pages_every_collection(client, detector):
+    created = [detector(name=f"Detector {n}")["id"] for n in range(5)]
+    first = client.get("/api/sync", params={"limit": 2}).json()
+    assert len(first["changed"]["smoke_detectors"]) == 2
+    assert first["next_cursors"]["smoke_detectors"]
+    assert first["next_cursors"]["deleted"] is None
+
+    _, changed, deleted = sync_all(client, limit=2)
+    assert changed["smoke_detectors"] == created
+    assert deleted == {name: [] for name in changed}
+
+def test_sync_since_a_watermark_returns_changes_and_deletions(client, server, detector, monkeypatch):
+    monkeypatch.setattr(server, "SYNC_GRACE_SECONDS", 0)
+    kept, updated = detector(name="Kept")["id"], detector(name="Updated")["id"]
+    removed = [detector(name=f"Removed {n}")["id"] for n in range(3)]
+    watermark = client.get("/api/sync").json()["watermark"]
+    time.sleep(0.01)
+
+    client.put(f"/api/admin/smoke-detectors/{updated}", json={"name": "Renamed"}, auth=ADMIN)
+    for detector_id in removed:
+        client.delete(f"/api/admin/smoke-detectors/{detector_id}", auth=ADMIN)
+
+    _, changed, deleted = sync_all(client, since=watermark, limit=2)
+    assert changed["smoke_detectors"] == [updated]
+    assert kept not in changed["smoke_detectors"]
+    assert sorted(deleted["smoke_detectors"]) == sorted(removed)
+
+def test_sync_pages_alerts_stored_before_they_had_updated_at(client, server, run):
+    alert = server.Alert(message="Old alert")
+    async def store_old_alert():
+        doc = server.to_document(alert)
+        del doc["updated_at"]
+        await server.db.alerts.insert_one(doc)
+        await server.backfill_updated_at()
+    run(store_old_alert)
+    page = client.get("/api/sync", params={"collection": "alerts"}).json()
+    assert [doc["id"] for doc in page["changed"]["alerts"]] == [alert.id]
+    assert page["changed"]["alerts"][0]["updated_at"] == page["changed"]["alerts"][0]["timestamp"]
+
+def test_sync_since_before_the_tombstone_retention_is_gone(client, server):
+    since = datetime.utcnow() - timedelta(days=server.TOMBSTONE_RETENTION_DAYS, minutes=1)
+    assert client.get("/api/sync", params={"since": since.isoformat()}).status_code == 410
+
+def test_sync_rejects_a_cursor_without_its_collection(client):
+    assert client.get("/api/sync", params={"after": "anything"}).status_code == 400
+    assert client.get("/api/sync", params={"collection": "dashboard_counters"}).status_code == 400
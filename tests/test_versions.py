@@ -0,0 +1,33 @@
+def versions(server, run):
+    async def read():
+        return {doc["_id"]: doc["version"] for doc in await server.db.collection_versions.find().to_list(None)}
+    return run(read)
+
+def test_a_trigger_bumps_every_touched_collection_in_one_update(client, server, run, detector, monkeypatch):
+    created = detector()
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    before = versions(server, run)
+
+    collection_type = type(server.db.collection_versions)
+    calls = []
+    for method in ("update_one", "update_many"):
+        original = getattr(collection_type, method)
+        def counting(self, *args, _method=method, _original=original, **kwargs):
+            if self.name == "collection_versions":
+                calls.append(_method)
+            return _original(self, *args, **kwargs)
+        monkeypatch.setattr(collection_type, method, counting)
+
+    etag = client.get("/api/alerts").headers["etag"]
+    client.post(f"/api/smoke-detectors/{created['id']}/trigger")
+    assert calls == ["update_many"]
+    after = versions(server, run)
+    assert {name: after[name] - before[name] for name in ("smoke_detectors", "alerts", "incidents")} == {
+        "smoke_detectors": 1, "alerts": 1, "incidents": 1,
+    }
+    assert client.get("/api/alerts", headers={"If-None-Match": etag}).status_code == 200
+
+def test_the_first_write_to_a_collection_creates_its_version(client, server, run):
+    run(lambda: server.bump_versions("smoke_detectors", "alerts"))
+    run(lambda: server.bump_versions("alerts"))
+    assert versions(server, run) == {"smoke_detectors": 1, "alerts": 2}